@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Benchmark the CSV engines used by the preprocessing loaders
+times each loader on the local RRF / NADAC files with every engine and prints the speedup
+over the default engine. run from automation/ with the input files in place
+"""
+
+import argparse
+import time
+
+from rxnorm_loaders import (
+    CSV_ENGINES, DEFAULT_CSV_ENGINE, load_nadac, load_rxnconso_lookups,
+    load_rxnrel_edges, load_rxnsat_lookups,
+)
+
+LOADERS = [
+    ('RXNSAT', load_rxnsat_lookups, 'RXNSAT.RRF'),
+    ('RXNCONSO', load_rxnconso_lookups, 'RXNCONSO.RRF'),
+    ('RXNREL', load_rxnrel_edges, 'RXNREL.RRF'),
+    ('NADAC', load_nadac, 'nadac-comparison.csv'),
+]
+
+
+def time_loader(loader, path, engine, repeats):
+    best = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        loader(path, engine)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare CSV engines on the pipeline loaders.')
+    parser.add_argument('--repeats', type=int, default=3, help='runs per loader/engine, best time is kept')
+    parser.add_argument('--engines', nargs='+', default=CSV_ENGINES, choices=CSV_ENGINES)
+    args = parser.parse_args()
+
+    results = []
+    for label, loader, path in LOADERS:
+        timings = {}
+        for engine in args.engines:
+            try:
+                timings[engine] = time_loader(loader, path, engine, args.repeats)
+            except FileNotFoundError:
+                print(f"WARNING: {path} not found, skipping {label}")
+                break
+        if timings:
+            results.append((label, timings))
+
+    print("\n" + "=" * 60)
+    print("CSV ENGINE BENCHMARK (best of %d, seconds)" % args.repeats)
+    print("=" * 60)
+    print(f"{'loader':<10}" + "".join(f"{engine:>10}" for engine in args.engines) + f"{'speedup':>10}")
+    for label, timings in results:
+        row = f"{label:<10}" + "".join(f"{timings[engine]:>10.2f}" for engine in args.engines)
+        baseline = timings.get(DEFAULT_CSV_ENGINE)
+        fastest = min(timings.values())
+        if baseline:
+            row += f"{baseline / fastest:>9.1f}x"
+        print(row)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,120 +2,204 @@
 """
 Extract ALL dosage forms from actual drug names in RXNCONSO.RRF
 grabs ONLY the form at the end, not ingredient lists
+
+RXNCONSO is streamed in chunks and the names are matched on a process pool, one Counter per
+chunk merged at the end. --incremental only matches RxCUIs that the last run hasn't seen
+(tracked in dosage_forms_CURATED_state.json) and adds them to its counts
 """
 
-import pandas as pd
+import argparse
+import json
+import os
 import re
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from rxnorm_loaders import CONSO_COLS, RXNCONSO_COLUMNS
 
-print("EXTRACTING DOSAGE FORMS FROM DRUG NAMES (FIXED)")
-
-# load RXNCONSO
-print("\n[1/4] Loading RXNCONSO.RRF...")
-
-try:
-    df_rxnconso = pd.read_csv('RXNCONSO.RRF', sep='|', header=None, 
-                              usecols=[0, 11, 12, 14, 16],
-                              names=['RXCUI', 'SAB', 'TTY', 'STR', 'SUPPRESS'],
-                              dtype=str, low_memory=False)
-    print(f"Loaded {len(df_rxnconso):,} rows")
-except FileNotFoundError:
-    print("ERROR: RXNCONSO.RRF not found!")
-    exit(1)
-
-# filter to RxNorm drug products
-print("\n[2/4] Filtering to RxNorm drug products...")
-df_drugs = df_rxnconso[
-    (df_rxnconso['SAB'] == 'RXNORM') & 
-    (df_rxnconso['TTY'].isin(['SCD', 'SBD', 'SCDF', 'SBDF'])) &
-    (~df_rxnconso['SUPPRESS'].isin(['Y', 'O']))
-].copy()
-print(f"    ✓ Found {len(df_drugs):,} drug products")
-
-# extract ONLY the dosage form at the end (1-5 capitalized words before optional [Brand])
-print("\n[3/4] Extracting dosage forms...")
+RXNCONSO_FILE = 'RXNCONSO.RRF'
+CURATED_JSON = 'dosage_forms_CURATED.json'
+CURATED_LIST = 'dosage_forms_CURATED_list.txt'
+# every form count (rare ones included) and the RxCUIs already counted, for --incremental
+STATE_FILE = 'dosage_forms_CURATED_state.json'
+
+DRUG_TTYS = ['SCD', 'SBD', 'SCDF', 'SBDF']
+MIN_COUNT = 3
+DEFAULT_CHUNK_ROWS = 250_000
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
 
 # pattern: Capture 1-5 capitalized words at the end, before optional [Brand]
 # this will match:
 #   "... Injectable Solution [Brand]" → "Injectable Solution"
 #   "... Oral Tablet" → "Oral Tablet"
 #   "... Extended Release Oral Capsule" → "Extended Release Oral Capsule"
-form_pattern = r'([A-Z][a-z]+(?:\s+[A-Z][a-z]+){0,4})(?:\s*\[|$)'
-
-forms_counter = Counter()
-unmatched = []
-
-for drug_name in df_drugs['STR']:
-    # find all matches (in case of multiple caps word sequences)
-    matches = re.findall(form_pattern, drug_name)
-    if matches:
+FORM_PATTERN = re.compile(r'([A-Z][a-z]+(?:\s+[A-Z][a-z]+){0,4})(?:\s*\[|$)')
+
+
+def iter_drug_chunks(path, chunk_rows, skip_rxcuis=frozenset()):
+    """yield (rxcuis, names) of the RxNorm drug products in each chunk of RXNCONSO"""
+    usecols = sorted(RXNCONSO_COLUMNS.index(c) for c in CONSO_COLS)
+    reader = pd.read_csv(path, sep='|', header=None, usecols=usecols,
+                         names=[RXNCONSO_COLUMNS[i] for i in usecols],
+                         dtype=str, chunksize=chunk_rows)
+    for chunk in reader:
+        drugs = chunk[
+            (chunk['SAB'] == 'RXNORM') &
+            (chunk['TTY'].isin(DRUG_TTYS)) &
+            (~chunk['SUPPRESS'].isin(['Y', 'O']))
+        ]
+        if skip_rxcuis:
+            # plain set membership, Series.isin with a large set is slow on Arrow-backed strings
+            drugs = drugs[[rxcui not in skip_rxcuis for rxcui in drugs['RXCUI']]]
+        if len(drugs):
+            yield drugs['RXCUI'].tolist(), drugs['STR'].fillna('').tolist()
+
+
+def extract_forms(names):
+    """Counter of the form at the end of each name, plus how many names had none"""
+    forms_counter = Counter()
+    unmatched = 0
+    for drug_name in names:
         # take the LAST match (the one right before end or [Brand])
-        form = matches[-1].strip()
-        forms_counter[form] += 1
-    else:
-        unmatched.append(drug_name)
-
-print(f"    ✓ Extracted forms from {len(df_drugs) - len(unmatched):,} drugs")
-print(f"    ⚠ Failed to extract from {len(unmatched):,} drugs")
-
-# get unique forms sorted by frequency
-forms_by_count = sorted(forms_counter.items(), key=lambda x: x[1], reverse=True)
-
-print(f"    ✓ Found {len(forms_by_count):,} UNIQUE dosage forms")
-
-# display results
-print("\n[4/4] Results...")
-print("\n" + "=" * 60)
-print(f"TOP 100 MOST COMMON DOSAGE FORMS:")
-print("=" * 60)
-
-for i, (form, count) in enumerate(forms_by_count[:100], 1):
-    print(f"{i:3}. '{form}' ({count:,} occurrences)")
-
-if len(forms_by_count) > 100:
-    print(f"\n... and {len(forms_by_count) - 100} more forms")
-
-# filter to forms appearing 3+ times
-forms_filtered = [(form, count) for form, count in forms_by_count if count >= 3]
-
-# sort by length for regex (longest first)
-forms_sorted_by_length = sorted(forms_filtered, key=lambda x: (len(x[0]), x[0].lower()), reverse=True)
-
-# coverage
-total_drugs = len(df_drugs)
-matched_drugs = sum(count for _, count in forms_by_count)
-filtered_drugs = sum(count for _, count in forms_filtered)
-
-print(f"\n" + "=" * 60)
-print("FILTERING & COVERAGE:")
-print("=" * 60)
-print(f"Total unique forms: {len(forms_by_count):,}")
-print(f"Forms appearing 3+ times: {len(forms_filtered):,}")
-print(f"Removed rare forms: {len(forms_by_count) - len(forms_filtered):,}")
-print(f"\nCoverage: {filtered_drugs:,}/{total_drugs:,} drugs ({filtered_drugs/total_drugs*100:.1f}%)")
-
-# save curated list
-output = {
-    "total_unique_forms": len(forms_filtered),
-    "total_extractions": filtered_drugs,
-    "coverage_percent": round(filtered_drugs/total_drugs*100, 2),
-    "forms": [{"form": form, "count": count} for form, count in forms_sorted_by_length]
-}
-
-import json
-with open('dosage_forms_CURATED.json', 'w') as f:
-    json.dump(output, f, indent=2)
-
-# save as Python list
-with open('dosage_forms_CURATED_list.txt', 'w') as f:
-    f.write("# Curated dosage forms (appearing 3+ times in actual data)\n")
-    f.write(f"# {len(forms_filtered)} forms covering {filtered_drugs/total_drugs*100:.1f}% of drugs\n")
-    f.write("# Sorted by length (longest first) for regex matching\n\n")
-    f.write("form_words = [\n")
-    for form, count in forms_sorted_by_length:
-        f.write(f"    '{form}',  # {count} occurrences\n")
-    f.write("]\n")
-
-print("\n✓ Saved curated list to: dosage_forms_CURATED_list.txt")
-print("✓ Saved JSON to: dosage_forms_CURATED.json")
-print(f"\nThis is the CLEAN list - use it in your preprocessing script!")
\ No newline at end of file
+        matches = FORM_PATTERN.findall(drug_name)
+        if matches:
+            forms_counter[matches[-1].strip()] += 1
+        else:
+            unmatched += 1
+    return forms_counter, unmatched
+
+
+def load_state(path=STATE_FILE):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Extract dosage forms from RxNorm drug names.')
+    parser.add_argument('--rxnconso', default=RXNCONSO_FILE)
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument('--incremental', action='store_true',
+                        help=f'only process RxCUIs not counted by the last run ({STATE_FILE})')
+    args = parser.parse_args()
+
+    print("EXTRACTING DOSAGE FORMS FROM DRUG NAMES (FIXED)")
+
+    forms_counter = Counter()
+    seen_rxcuis = set()
+    total_drugs = 0
+    unmatched = 0
+
+    state = load_state() if args.incremental else None
+    if args.incremental and state is None:
+        print(f"\nNo {STATE_FILE} yet, running a full extraction")
+    if state is not None:
+        forms_counter.update(state['forms'])
+        seen_rxcuis.update(state['rxcuis'])
+        total_drugs = state['total_drugs']
+        unmatched = state['unmatched']
+        print(f"\nIncremental: {len(seen_rxcuis):,} RxCUIs already counted, only new ones are processed")
+
+    # stream RXNCONSO, filter each chunk to RxNorm drug products, extract on the pool
+    print(f"\n[1/3] Streaming {args.rxnconso} and extracting dosage forms ({args.workers} workers)...")
+    if not os.path.exists(args.rxnconso):
+        print(f"ERROR: {args.rxnconso} not found!")
+        exit(1)
+
+    new_drugs = 0
+    new_unmatched = 0
+    skip = frozenset(seen_rxcuis)
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        pending = []
+        for rxcuis, names in iter_drug_chunks(args.rxnconso, args.chunk_rows, skip):
+            seen_rxcuis.update(rxcuis)
+            new_drugs += len(names)
+            pending.append(pool.submit(extract_forms, names))
+        for future in pending:
+            chunk_counter, chunk_unmatched = future.result()
+            forms_counter.update(chunk_counter)
+            new_unmatched += chunk_unmatched
+
+    total_drugs += new_drugs
+    unmatched += new_unmatched
+    print(f"    ✓ Processed {new_drugs:,} drug products ({total_drugs:,} in total)")
+    print(f"    ✓ Extracted forms from {new_drugs - new_unmatched:,} drugs")
+    print(f"    ⚠ Failed to extract from {new_unmatched:,} drugs")
+
+    # get unique forms sorted by frequency
+    forms_by_count = sorted(forms_counter.items(), key=lambda x: x[1], reverse=True)
+
+    print(f"    ✓ Found {len(forms_by_count):,} UNIQUE dosage forms")
+
+    # display results
+    print("\n[2/3] Results...")
+    print("\n" + "=" * 60)
+    print("TOP 100 MOST COMMON DOSAGE FORMS:")
+    print("=" * 60)
+
+    for i, (form, count) in enumerate(forms_by_count[:100], 1):
+        print(f"{i:3}. '{form}' ({count:,} occurrences)")
+
+    if len(forms_by_count) > 100:
+        print(f"\n... and {len(forms_by_count) - 100} more forms")
+
+    # filter to forms appearing 3+ times
+    forms_filtered = [(form, count) for form, count in forms_by_count if count >= MIN_COUNT]
+
+    # sort by length for regex (longest first)
+    forms_sorted_by_length = sorted(forms_filtered, key=lambda x: (len(x[0]), x[0].lower()), reverse=True)
+
+    # coverage
+    filtered_drugs = sum(count for _, count in forms_filtered)
+    coverage = filtered_drugs / total_drugs * 100 if total_drugs else 0
+
+    print("\n" + "=" * 60)
+    print("FILTERING & COVERAGE:")
+    print("=" * 60)
+    print(f"Total unique forms: {len(forms_by_count):,}")
+    print(f"Forms appearing {MIN_COUNT}+ times: {len(forms_filtered):,}")
+    print(f"Removed rare forms: {len(forms_by_count) - len(forms_filtered):,}")
+    print(f"\nCoverage: {filtered_drugs:,}/{total_drugs:,} drugs ({coverage:.1f}%)")
+
+    # save curated list
+    print("\n[3/3] Saving...")
+    output = {
+        "total_unique_forms": len(forms_filtered),
+        "total_extractions": filtered_drugs,
+        "coverage_percent": round(coverage, 2),
+        "forms": [{"form": form, "count": count} for form, count in forms_sorted_by_length]
+    }
+
+    with open(CURATED_JSON, 'w') as f:
+        json.dump(output, f, indent=2)
+
+    # save as Python list
+    with open(CURATED_LIST, 'w') as f:
+        f.write(f"# Curated dosage forms (appearing {MIN_COUNT}+ times in actual data)\n")
+        f.write(f"# {len(forms_filtered)} forms covering {coverage:.1f}% of drugs\n")
+        f.write("# Sorted by length (longest first) for regex matching\n\n")
+        f.write("form_words = [\n")
+        for form, count in forms_sorted_by_length:
+            f.write(f"    '{form}',  # {count} occurrences\n")
+        f.write("]\n")
+
+    with open(STATE_FILE, 'w') as f:
+        json.dump({
+            "total_drugs": total_drugs,
+            "unmatched": unmatched,
+            "forms": dict(forms_counter),
+            "rxcuis": sorted(seen_rxcuis),
+        }, f, separators=(',', ':'))
+
+    print(f"\n✓ Saved curated list to: {CURATED_LIST}")
+    print(f"✓ Saved JSON to: {CURATED_JSON}")
+    print(f"✓ Saved incremental state to: {STATE_FILE}")
+    print("\nThis is the CLEAN list - use it in your preprocessing script!")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,269 @@
+"""
+Steps 3 and 4 of the preprocessing pipeline: map NADAC rows to RxCUI, then clean them and
+attach brand/generic, ingredient, manufacturer, strength and form attributes
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+from rxnorm_loaders import clean_ndc
+
+
+def categorize_dosage_form(form):
+    if not form:
+        return "Other"
+    f = form.lower()
+    if "delayed" in f or "extended" in f:
+        if "capsule" in f:
+            return "Delayed/Extended Release Oral Capsules"
+        if "tablet" in f:
+            return "Delayed/Extended Release Oral Tablets"
+    if "capsule" in f:
+        return "Oral Capsule"
+    if "tablet" in f:
+        return "Oral Tablet"
+    if "injection" in f or "injectable" in f:
+        return "Injection"
+    if "inhalation" in f:
+        return "Inhalation"
+    if "topical" in f or "cream" in f or "ointment" in f or "gel" in f:
+        return "Topical"
+    return "Other"
+
+
+def map_nadac_to_rxcui(df_nadac, rxnsat_lookups):
+    print("\n[3/5] Mapping NADAC dataset to RxCUI...")
+    ndc_to_rxcui = rxnsat_lookups['ndc_to_rxcui']
+
+    df_nadac = df_nadac.copy()
+    initial_rows = len(df_nadac)
+
+    df_nadac['NDC_KEY'] = clean_ndc(df_nadac['NDC'])
+
+    df_nadac['RXCUI'] = df_nadac['NDC_KEY'].map(ndc_to_rxcui)
+    df_nadac.drop(columns=['NDC_KEY'], inplace=True)
+
+    mapped_count = df_nadac['RXCUI'].notna().sum()
+    success_rate = mapped_count / initial_rows if initial_rows > 0 else 0
+
+    print(f"    total NADAC rows: {initial_rows:,}")
+    print(f"    successfully mapped to RxCUI: {mapped_count:,}")
+    print(f"    RxCUI mapping success rate: {success_rate:.2%}")
+
+    return df_nadac
+
+
+def enrich_nadac(df_nadac, rxnsat_lookups, conso_lookups, relationships):
+    print("\n[4/5] Cleaning data and mapping relationships...")
+    ndc_to_labeler = rxnsat_lookups['ndc_to_labeler']
+    manuf_name_lookup = rxnsat_lookups['manuf_name_lookup']
+    strength_lookup = rxnsat_lookups['strength_lookup']
+    name_lookup = conso_lookups['name_lookup']
+    product_to_ingredients = relationships['product_to_ingredients']
+    form_lookup = relationships['form_lookup']
+    dose_form_group_lookup = relationships['dose_form_group_lookup']
+    brand_to_generic_map = relationships['brand_to_generic_map']
+    generic_to_brand_map = relationships['generic_to_brand_map']
+
+
+    price_col = next(col for col in ['New NADAC Per Unit', 'Old NADAC Per Unit'] if col in df_nadac.columns)
+    date_col = next(col for col in ['Effective Date', 'Effective_Date'] if col in df_nadac.columns)
+    classification_col = next(col for col in ['Classification for Rate Setting', 'Classification'] if col in df_nadac.columns)
+
+    df_nadac = df_nadac.rename(columns={
+        'NDC Description': 'Name',
+        price_col: 'Price',
+        date_col: 'Date',
+    })
+
+    df_processed = df_nadac[df_nadac['RXCUI'].notna()].copy()
+    df_processed['Price'] = pd.to_numeric(df_processed['Price'], errors='coerce')
+    df_processed = df_processed[df_processed['Price'] > 0].copy()
+    df_processed.dropna(subset=['Date'], inplace=True)
+    df_processed['RXCUI'] = df_processed['RXCUI'].astype(str).str.strip()
+    df_processed['Date'] = df_processed['Date'].astype(str).str.strip()
+    df_processed['IsBrand'] = (df_processed[classification_col].str.strip().str.upper() == 'B')
+
+
+    print("    mapping brand/generic relationships with fallback logic...")
+
+    def find_related_rxcui(rxcui, is_brand):
+        rxcui = str(rxcui).strip()
+        brand_rxcui = None
+        generic_rxcui = None
+
+        if is_brand:
+            brand_rxcui = rxcui
+            generic_rxcui = brand_to_generic_map.get(rxcui)
+            if not generic_rxcui:
+                generic_rxcui = generic_to_brand_map.get(rxcui)
+        else:
+            generic_rxcui = rxcui
+            brand_rxcui = generic_to_brand_map.get(rxcui)
+            if not brand_rxcui:
+                brand_rxcui = brand_to_generic_map.get(rxcui)
+
+        return brand_rxcui, generic_rxcui
+
+    results = df_processed.apply(
+        lambda row: find_related_rxcui(row['RXCUI'], row['IsBrand']), 
+        axis=1
+    )
+    df_processed['Brand_RxCUI'] = results.apply(lambda x: x[0] if x[0] else '')
+    df_processed['Generic_RxCUI'] = results.apply(lambda x: x[1] if x[1] else '')
+
+
+    # brand products without their own ingredient links inherit the generic's
+    ingredients_own = df_processed['RXCUI'].map(product_to_ingredients)
+    ingredients_generic = df_processed['Generic_RxCUI'].map(product_to_ingredients)
+    df_processed['Ingredient_RxCUIs'] = ingredients_own.where(ingredients_own.notna(), ingredients_generic)
+    df_processed['Ingredient_RxCUIs'] = df_processed['Ingredient_RxCUIs'].apply(lambda x: x if isinstance(x, list) else [])
+    df_processed['Manufacturer_Name'] = df_processed['RXCUI'].map(manuf_name_lookup).fillna('') 
+    # labeler of the NDC itself, generics are usually sold under many labelers per RxCUI
+    df_processed['Labeler_Name'] = clean_ndc(df_processed['NDC']).map(ndc_to_labeler).fillna('')
+    df_processed['Strength'] = df_processed['RXCUI'].map(strength_lookup).fillna('')
+    df_processed['Form'] = df_processed['RXCUI'].map(form_lookup).fillna('')
+
+    df_processed['Name'] = df_processed['RXCUI'].map(name_lookup).fillna(df_processed['Name'])
+
+
+    # manufacturer fallback
+    manufacturer_pattern = r'\[([^\]]+)\]'
+    mask_missing_manuf = (df_processed['Manufacturer_Name'] == '')
+
+    if mask_missing_manuf.any():
+        print("    applying vectorized regex fallback for missing manufacturer (extracting [bracketed name])...")
+
+        def get_first_bracketed(name_series):
+            matches = name_series.str.findall(manufacturer_pattern)
+            return matches.apply(lambda x: x[0] if x else '')
+
+        manufacturer_fb = get_first_bracketed(df_processed.loc[mask_missing_manuf, 'Name'])
+
+        df_processed.loc[mask_missing_manuf, 'Manufacturer_Name'] = np.where(
+            df_processed.loc[mask_missing_manuf, 'Manufacturer_Name'] == '',
+            manufacturer_fb,
+            df_processed.loc[mask_missing_manuf, 'Manufacturer_Name']
+        )
+
+    # strength/form fallback
+    mask_missing_strength_form = (df_processed['Strength'] == '') | (df_processed['Form'] == '')
+
+    if mask_missing_strength_form.any():
+        print("    applying comprehensive regex fallback for missing strength/form...")
+
+        strength_pattern = r'(\d+\.?\d*\s*[A-Z]{1,4}(?:/[A-Z]{1,4})?)'
+
+        form_words = [
+            'Extended Release Oral Tablet',
+            'Extended Release Oral Capsule',
+            'Disintegrating Oral Tablet',
+            'Delayed Release Oral Tablet',
+            'Delayed Release Oral Capsule',
+            'Metered Dose Nasal Spray',
+            'Powder for Oral Suspension',
+            'Mucous Membrane Topical Solution',
+            'Inhalant Powder for Oral Inhalation',
+            'Metered Dose Inhaler',
+            'Dry Powder Inhaler',
+            'Injectable Solution',
+            'Injectable Suspension',
+            'Intraperitoneal Solution',
+            'Prefilled Syringe',
+            'Pen Injector',
+            'Transdermal System',
+            'Ophthalmic Solution',
+            'Ophthalmic Suspension',
+            'Ophthalmic Ointment',
+            'Oral Tablet',
+            'Oral Capsule',
+            'Oral Solution',
+            'Oral Suspension',
+            'Oral Lozenge',
+            'Oral Granules',
+            'Oral Powder',
+            'Oral Pellet',
+            'Oral Gel',
+            'Chewable Tablet',
+            'Sublingual Tablet',
+            'Topical Cream',
+            'Topical Gel',
+            'Topical Ointment',
+            'Topical Solution',
+            'Topical Lotion',
+            'Topical Spray',
+            'Topical Foam',
+            'Topical Powder',
+            'Nasal Spray',
+            'Rectal Suppository',
+            'Medicated Pad',
+            'Medicated Shampoo',
+            'Medicated Patch',
+            'Medicated Liquid Soap',
+            'Inhalation Solution',
+            'Drug Implant',
+            'Mucosal Spray',
+            'Tablet',
+            'Capsule',
+            'Injection',
+            'Solution',
+            'Suspension',
+            'Ointment',
+            'Cream',
+            'Lotion',
+            'Syrup',
+            'Powder',
+            'Aerosol',
+            'Patch',
+            'Gel',
+            'Kit',
+            'Vial',
+            'Cartridge',
+            'Injector',
+            'Mouthwash',
+        ]
+        form_pattern = r'\b(' + '|'.join(form_words) + r')(?:\s*\[|$)'
+
+        strength_fb = df_processed.loc[mask_missing_strength_form, 'Name'].str.extract(
+            strength_pattern, expand=False, flags=re.IGNORECASE
+        ).fillna('')
+
+        form_fb = df_processed.loc[mask_missing_strength_form, 'Name'].str.extract(
+            form_pattern, expand=False, flags=re.IGNORECASE
+        ).fillna('')
+
+        df_processed.loc[mask_missing_strength_form, 'Strength'] = np.where(
+            df_processed.loc[mask_missing_strength_form, 'Strength'] == '',
+            strength_fb,
+            df_processed.loc[mask_missing_strength_form, 'Strength']
+        )
+
+        df_processed.loc[mask_missing_strength_form, 'Form'] = np.where(
+            df_processed.loc[mask_missing_strength_form, 'Form'] == '',
+            form_fb,
+            df_processed.loc[mask_missing_strength_form, 'Form']
+        )
+
+
+    df_processed['Dose_Form_Groups'] = df_processed['RXCUI'].map(dose_form_group_lookup)
+    df_processed['Dose_Form_Groups'] = df_processed['Dose_Form_Groups'].apply(lambda x: x if isinstance(x, list) else [])
+
+    # categorize each distinct form once instead of per row
+    unique_forms = df_processed['Form'].unique()
+    form_category_lookup = {form: categorize_dosage_form(form) for form in unique_forms}
+    df_processed['Form_Category'] = df_processed['Form'].map(form_category_lookup)
+
+    missing_name = df_processed['Manufacturer_Name'].eq('').sum()
+    missing_strength = df_processed['Strength'].eq('').sum()
+    missing_form = df_processed['Form'].eq('').sum()
+
+    print(f"    diagnostics on mapped attributes (total rows: {len(df_processed):,})")
+    print(f"      rows missing manufacturer (name): {missing_name:,}")
+    print(f"      rows missing strength: {missing_strength:,}")
+    print(f"      rows missing form: {missing_form:,}")
+
+    print(f"    data cleaned and attributes mapped. {len(df_processed):,} rows remaining in pipeline.")
+
+    return df_processed
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+NDC lookup index: 11-digit NDC -> RxCUI, labeler code and name, brand flag and latest price
+rows are sorted by NDC and sharded by the first digits of the labeler code, so a lookup
+loads one small shard and binary-searches it instead of scanning every price file.
+
+ndc/index.json lists the shards, ndc/<prefix>.json holds {columns, rows} for one prefix
+"""
+
+import argparse
+import bisect
+import json
+import os
+import re
+
+import pandas as pd
+
+from price_frame import DATA_DIR, PRICES_DIR, load_price_frame, prepare_price_frame
+from rxnorm_loaders import clean_ndc, load_rxnsat_lookups
+
+NDC_INDEX_DIR = os.path.join(DATA_DIR, 'ndc')
+# two labeler digits -> at most 100 shards of a few hundred KB each
+SHARD_PREFIX_LEN = 2
+NDC_COLUMNS = ['ndc', 'rxcui', 'labeler_code', 'labeler', 'is_brand', 'latest_price', 'latest_date']
+
+
+def normalize_ndc(ndc):
+    """
+    11-digit (5-4-2) form of an NDC as printed on a label, or None if it can't be one
+    hyphenated 10-digit codes (4-4-2, 5-3-2, 5-4-1) are padded in the short segment,
+    bare digits are zero-filled on the left like the pipeline's clean_ndc
+    """
+    ndc = str(ndc).strip()
+    parts = ndc.split('-')
+    if len(parts) == 3:
+        if not all(part.isdigit() for part in parts):
+            return None
+        labeler, product, package = parts
+        if len(labeler) > 5 or len(product) > 4 or len(package) > 2:
+            return None
+        return labeler.zfill(5) + product.zfill(4) + package.zfill(2)
+    digits = re.sub(r'\D', '', ndc)
+    if not digits or len(digits) > 11:
+        return None
+    return digits.zfill(11)
+
+
+def compute_ndc_table(df, ndc_to_labeler=None):
+    """
+    one row per NDC from the long price frame: its RxCUI, labeler, brand flag and latest price
+    the labeler code is the NDC's first five digits; the name comes from ndc_to_labeler
+    (RXNSAT LABELER per NDC), or from the frame's per-row Labeler_Name when not given
+    """
+    if ndc_to_labeler is None and 'Labeler_Name' in df.columns:
+        named = df[df['Labeler_Name'].fillna('') != '']
+        ndc_to_labeler = dict(zip(clean_ndc(named['NDC'].astype(str)), named['Labeler_Name']))
+
+    df = prepare_price_frame(df)
+    df['NDC'] = clean_ndc(df['NDC'].astype(str))
+    latest = (
+        df.sort_values(['NDC', 'DateParsed'], kind='mergesort')
+        .groupby('NDC', sort=True)
+        .last()
+        .reset_index()
+    )
+    table = pd.DataFrame({
+        'ndc': latest['NDC'],
+        'rxcui': latest['RXCUI'],
+        'labeler_code': latest['NDC'].str[:5],
+        'labeler': latest['NDC'].map(ndc_to_labeler or {}).fillna(''),
+        'is_brand': latest['IsBrand'].astype(bool),
+        'latest_price': latest['Price'].round(5),
+        'latest_date': latest['Date'],
+    })
+    return table[NDC_COLUMNS]
+
+
+def write_ndc_index(df, out_dir=NDC_INDEX_DIR, ndc_to_labeler=None):
+    """write one shard per labeler prefix plus index.json; returns the NDC table"""
+    table = compute_ndc_table(df, ndc_to_labeler)
+    os.makedirs(out_dir, exist_ok=True)
+    # drop shards from the previous run so index.json never points at stale prefixes
+    for filename in os.listdir(out_dir):
+        if filename.endswith('.json'):
+            os.remove(os.path.join(out_dir, filename))
+
+    shards = {}
+    for prefix, shard in table.groupby(table['ndc'].str[:SHARD_PREFIX_LEN], sort=True):
+        rows = [list(row) for row in shard.itertuples(index=False)]
+        with open(os.path.join(out_dir, f'{prefix}.json'), 'w') as f:
+            json.dump({'columns': NDC_COLUMNS, 'rows': rows}, f, separators=(',', ':'))
+        shards[prefix] = len(rows)
+
+    with open(os.path.join(out_dir, 'index.json'), 'w') as f:
+        json.dump({'prefix_len': SHARD_PREFIX_LEN, 'columns': NDC_COLUMNS, 'shards': shards}, f, indent=2)
+    return table
+
+
+class NdcIndex:
+    """lazy reader over the sharded index, each shard is loaded once on first use"""
+
+    def __init__(self, index_dir=NDC_INDEX_DIR):
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, 'index.json'), 'r') as f:
+            meta = json.load(f)
+        self.prefix_len = meta['prefix_len']
+        self.columns = meta['columns']
+        self.shard_names = set(meta['shards'])
+        self.shards = {}
+
+    def _shard(self, prefix):
+        if prefix not in self.shards:
+            with open(os.path.join(self.index_dir, f'{prefix}.json'), 'r') as f:
+                rows = json.load(f)['rows']
+            self.shards[prefix] = ([row[0] for row in rows], rows)
+        return self.shards[prefix]
+
+    def lookup(self, ndc):
+        """{ndc, rxcui, labeler_code, labeler, is_brand, latest_price, latest_date} for an NDC, or None if not indexed"""
+        ndc = normalize_ndc(ndc)
+        if ndc is None:
+            return None
+        prefix = ndc[:self.prefix_len]
+        if prefix not in self.shard_names:
+            return None
+        keys, rows = self._shard(prefix)
+        idx = bisect.bisect_left(keys, ndc)
+        if idx < len(keys) and keys[idx] == ndc:
+            return dict(zip(self.columns, rows[idx]))
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or query the sharded NDC lookup index.')
+    parser.add_argument('--index-dir', default=NDC_INDEX_DIR)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    build = sub.add_parser('build', help='build the index from the generated price files')
+    build.add_argument('--prices-dir', default=PRICES_DIR)
+    build.add_argument('--rxnsat', help='RXNSAT.RRF to resolve labeler names per NDC (codes only without it)')
+
+    lookup = sub.add_parser('lookup', help='look up one or more NDCs (hyphenated or 11-digit)')
+    lookup.add_argument('ndcs', nargs='+')
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        print("Loading price series...")
+        ndc_to_labeler = {}
+        if args.rxnsat:
+            ndc_to_labeler = load_rxnsat_lookups(args.rxnsat)['ndc_to_labeler']
+        else:
+            print("    WARNING: no --rxnsat given, labeler names are left empty (codes are still written)")
+        table = write_ndc_index(load_price_frame(args.prices_dir), args.index_dir, ndc_to_labeler)
+        print(f"    indexed {len(table):,} NDCs")
+        print(f"saved NDC index to: {args.index_dir}")
+    else:
+        index = NdcIndex(args.index_dir)
+        print(json.dumps({ndc: index.lookup(ndc) for ndc in args.ndcs}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,30 +1,23 @@
-def categorize_dosage_form(form):
-    if not form:
-        return "Other"
-    f = form.lower()
-    if "delayed" in f or "extended" in f:
-        if "capsule" in f:
-            return "Delayed/Extended Release Oral Capsules"
-        if "tablet" in f:
-            return "Delayed/Extended Release Oral Tablets"
-    if "capsule" in f:
-        return "Oral Capsule"
-    if "tablet" in f:
-        return "Oral Tablet"
-    if "injection" in f or "injectable" in f:
-        return "Injection"
-    if "inhalation" in f:
-        return "Inhalation"
-    if "topical" in f or "cream" in f or "ointment" in f or "gel" in f:
-        return "Topical"
-    return "Other"
 import pandas as pd
+import hashlib
 import json
 import os
 import re 
 from tqdm import tqdm
-import numpy as np 
 import math 
+from nadac_enrich import categorize_dosage_form, enrich_nadac, map_nadac_to_rxcui
+from ndc_index import write_ndc_index
+import price_encoding
+from price_encoding import CHANGE_POINTS, decode_drug, encode_drug
+from price_events import write_price_events
+from summary_stats import write_summary_stats
+from price_packs import build_price_packs
+from rankings import write_rankings
+from rxnorm_loaders import (
+    DEFAULT_CSV_ENGINE, build_relationship_lookups, load_nadac, load_rxnconso_lookups,
+    load_rxnrel_edges, load_rxnsat_lookups,
+)
+from stage_runner import DEFAULT_MAX_WORKERS, Stage, file_memory_estimate, run_stages, stage_keys
 
 # configuration
 DATA_DIR = '../src/lib/data'
@@ -43,351 +36,57 @@ print("NADAC + RxNorm Preprocessing (FIXED FORM EXTRACTION)")
 print("=" * 60)
 
 
-# STEP 1: load RxNorm RXNSAT and RXNCONSO for all lookups
-print("\n[1/5] Loading and preparing RxNorm files for all lookups...")
-
-# define columns for RXNSAT
-rxnsat_columns = [
-    'RXCUI', 'LUI', 'SUI', 'RXAUI', 'STYPE', 'CODE', 'ATUI', 
-    'SATUI', 'ATN', 'SAB', 'ATV', 'SUPPRESS', 'CVF', 'EXTRA'
-]
-df_rxnsat = pd.read_csv(RXNSAT_FILE, sep='|', header=None, names=rxnsat_columns, dtype=str, low_memory=False)
-
-# define columns for RXNCONSO
-conso_cols = [
-    'RXCUI', 'SAB', 'TTY', 'STR', 'SUPPRESS'
+# STEP 1: load RxNorm files and NADAC concurrently
+# the four loads are independent, so they run on a process pool and only hand back
+# compact lookup tables; the memory budget keeps them from all parsing at once on small machines
+# every stage is checkpointed, so a rerun after a crash restores finished stages instead of
+# re-parsing the RRF files (PREPROCESS_CHECKPOINTS=0 turns this off)
+print("\n[1/5] Loading RxNorm files and NADAC dataset concurrently...")
+
+MAX_WORKERS = int(os.environ.get('PREPROCESS_WORKERS', DEFAULT_MAX_WORKERS))
+MEMORY_BUDGET_GB = float(os.environ.get('PREPROCESS_MEMORY_BUDGET_GB', '8'))
+# PREPROCESS_CSV_ENGINE=arrow reads the RRF files and NADAC CSV with pyarrow (pinned in requirements.txt)
+CSV_ENGINE = os.environ.get('PREPROCESS_CSV_ENGINE', DEFAULT_CSV_ENGINE)
+CHECKPOINT_DIR = None
+if os.environ.get('PREPROCESS_CHECKPOINTS', '1') != '0':
+    CHECKPOINT_DIR = os.environ.get('PREPROCESS_CHECKPOINT_DIR', '.checkpoints')
+print(f"    up to {MAX_WORKERS} workers, memory budget {MEMORY_BUDGET_GB:g} GB, CSV engine '{CSV_ENGINE}', "
+      f"checkpoints {CHECKPOINT_DIR or 'off'}")
+
+load_stages = [
+    Stage('rxnsat', load_rxnsat_lookups, args=(RXNSAT_FILE, CSV_ENGINE), inputs=(RXNSAT_FILE,),
+          memory_estimate=file_memory_estimate(RXNSAT_FILE, 3)),
+    Stage('rxnconso', load_rxnconso_lookups, args=(RXNCONSO_FILE, CSV_ENGINE), inputs=(RXNCONSO_FILE,),
+          memory_estimate=file_memory_estimate(RXNCONSO_FILE, 2)),
+    Stage('rxnrel', load_rxnrel_edges, args=(RXNREL_FILE, CSV_ENGINE), inputs=(RXNREL_FILE,),
+          memory_estimate=file_memory_estimate(RXNREL_FILE, 3)),
+    Stage('nadac', load_nadac, args=(NADAC_FILE, CSV_ENGINE), inputs=(NADAC_FILE,),
+          memory_estimate=file_memory_estimate(NADAC_FILE, 5)),
+    # STEP 2 runs in the parent as soon as RXNREL and RXNCONSO are in, while NADAC may still be loading
+    Stage('relationships', build_relationship_lookups, deps=('rxnrel', 'rxnconso'), local=True),
+    # STEPS 3 and 4 (nadac_enrich.py)
+    Stage('nadac_mapped', map_nadac_to_rxcui, deps=('nadac', 'rxnsat'), local=True),
+    Stage('enriched', enrich_nadac, deps=('nadac_mapped', 'rxnsat', 'rxnconso', 'relationships'), local=True),
 ]
+stage_results = run_stages(load_stages, max_workers=MAX_WORKERS,
+                           memory_budget=int(MEMORY_BUDGET_GB * 1024 ** 3),
+                           checkpoint_dir=CHECKPOINT_DIR, targets=['enriched', 'rxnconso'])
 
-try:
-    df_rxnconso = pd.read_csv(RXNCONSO_FILE, sep='|', header=None, names=conso_cols, 
-                             dtype=str, low_memory=False, usecols=[0, 11, 12, 14, 16])
-    print(f"    - RXNCONSO loaded with {len(df_rxnconso):,} rows.")
-    
-    # TTY lookup
-    df_tty = df_rxnconso[df_rxnconso['SAB'] == 'RXNORM'][['RXCUI', 'TTY']].drop_duplicates(subset=['RXCUI'], keep='first')
-    rxcui_to_tty = dict(zip(df_tty['RXCUI'], df_tty['TTY']))
-    
-except FileNotFoundError:
-    print(f"    WARNING: {RXNCONSO_FILE} not found. Skipping official name mapping and TTY lookup.")
-    df_rxnconso = pd.DataFrame(columns=conso_cols) 
-    rxcui_to_tty = {}
-except ValueError as e:
-    print(f"    ERROR: Failed to read {RXNCONSO_FILE}. Check the number of pipe-separated fields or 'usecols' indices.")
-    print(f"    Original Error: {e}")
-    df_rxnconso = pd.DataFrame(columns=conso_cols)
-    rxcui_to_tty = {}
-
-
-# NDC to RxCUI map
-df_rxcui_map = df_rxnsat[df_rxnsat['ATN'] == 'NDC'][['ATV', 'RXCUI']].copy()
-df_rxcui_map['NDC_KEY'] = (
-    df_rxcui_map['ATV'].str.replace('-', '', regex=False).str.strip().str.zfill(11)
-)
-ndc_to_rxcui = dict(zip(df_rxcui_map['NDC_KEY'], df_rxcui_map['RXCUI']))
-del df_rxcui_map
-print(f"    created NDC-to-RxCUI map with {len(ndc_to_rxcui):,} unique NDC keys.")
-
-
-# official name lookup
-if not df_rxnconso.empty:
-    OFFICIAL_NAME_TTYS = ['SCD', 'SBD', 'PT', 'SCDF', 'SBDF', 'IN'] 
-    SUPPRESSED_FLAGS = ['Y', 'O']
-    
-    df_official_names = df_rxnconso[
-        (df_rxnconso['SAB'] == 'RXNORM') & 
-        (df_rxnconso['TTY'].isin(OFFICIAL_NAME_TTYS)) &
-        (~df_rxnconso['SUPPRESS'].isin(SUPPRESSED_FLAGS))
-    ].drop_duplicates(subset=['RXCUI'], keep='first')[['RXCUI', 'STR']]
-    name_lookup = dict(zip(df_official_names['RXCUI'], df_official_names['STR']))
-    print(f"    extracted {len(name_lookup):,} official RxNorm names (including ingredients).")
-else:
-    name_lookup = {}
-
-# other lookups
-df_manuf_name = df_rxnsat[
-    df_rxnsat['ATN'].isin(['LBL', 'MANU']) & 
-    df_rxnsat['SAB'].isin(['RXNORM', 'MTHSPL']) 
-][['RXCUI', 'ATV']].drop_duplicates(subset=['RXCUI'], keep='first').copy()
-manuf_name_lookup = dict(zip(df_manuf_name['RXCUI'], df_manuf_name['ATV']))
-del df_manuf_name
-
-df_strength = df_rxnsat[
-    df_rxnsat['ATN'].isin(['STRENGTH', 'SCD_STRING'])
-].sort_values(by=['ATN'], ascending=False).drop_duplicates(subset=['RXCUI'], keep='first')[['RXCUI', 'ATV']]
-strength_lookup = dict(zip(df_strength['RXCUI'], df_strength['ATV']))
-del df_strength
-
-# form lookup removed - will be extracted from drug names using regex
-form_lookup = {}
-print("    form lookup from RXNSAT disabled (DF attribute doesn't exist)")
-print("    forms will be extracted from drug names using comprehensive regex")
-
-del df_rxnsat
-
-
-# STEP 2: load RxNorm RXNREL
-print("\n[2/5] Loading and preparing RXNREL for relationship mapping...")
-rxnrel_columns = [
-    'RXCUI1', 'RXAUI1', 'STYPE1', 'REL', 'RXCUI2', 'RXAUI2', 
-    'STYPE2', 'RELA', 'RUI', 'SRUI', 'SAB', 'SL', 'DIR', 
-    'RG', 'SUPPRESS', 'CVF'
-]
-df_rxnrel = pd.read_csv(RXNREL_FILE, sep='|', header=None, names=rxnrel_columns, 
-                         usecols=range(len(rxnrel_columns)), dtype=str, low_memory=False)
-
-df_rxnrel = df_rxnrel[df_rxnrel['SAB'] == 'RXNORM'].copy()
-
-# ingredient mapping
-df_ingredient_rel = df_rxnrel[
-    df_rxnrel['RELA'] == 'has_ingredient'
-][['RXCUI1', 'RXCUI2']].rename(columns={'RXCUI1': 'Product_RxCUI', 'RXCUI2': 'Ingredient_RxCUI_Found'})
-product_to_ingredient_map = dict(zip(df_ingredient_rel['Product_RxCUI'], df_ingredient_rel['Ingredient_RxCUI_Found']))
-del df_ingredient_rel
-
-# brand/generic relationship mapping
-RELA_FILTERS = ['tradename_of', 'brand_name_of', 'has_tradename', 'has_brand_name']
-df_relationships = df_rxnrel[df_rxnrel['RELA'].isin(RELA_FILTERS)].copy()
-del df_rxnrel
-
-print("    building bidirectional relationship lookup tables...")
-brand_to_generic_map = {}
-generic_to_brand_map = {}
-
-for _, row in df_relationships.iterrows():
-    rxcui1 = str(row['RXCUI1']).strip()
-    rxcui2 = str(row['RXCUI2']).strip()
-    rela = str(row['RELA']).strip()
-    
-    if rela in ['tradename_of', 'brand_name_of']:
-        brand_to_generic_map[rxcui1] = rxcui2
-        if rxcui2 not in generic_to_brand_map:
-            generic_to_brand_map[rxcui2] = rxcui1
-    elif rela in ['has_tradename', 'has_brand_name']:
-        generic_to_brand_map[rxcui1] = rxcui2
-        if rxcui2 not in brand_to_generic_map:
-            brand_to_generic_map[rxcui2] = rxcui1
-
-print(f"    built {len(brand_to_generic_map):,} brand to generic mappings")
-print(f"    built {len(generic_to_brand_map):,} generic to brand mappings")
-del df_relationships
-
-
-# STEP 3: load NADAC and map RxCUI
-print("\n[3/5] Loading NADAC dataset and mapping RxCUI...")
-
-df_nadac = pd.read_csv(NADAC_FILE, dtype=str)
-initial_rows = len(df_nadac)
-
-df_nadac['NDC_KEY'] = (
-    df_nadac['NDC']
-    .fillna('')
-    .str.replace('-', '', regex=False)
-    .str.strip()
-    .str.zfill(11)
-)
-
-df_nadac['RXCUI'] = df_nadac['NDC_KEY'].map(ndc_to_rxcui)
-df_nadac.drop(columns=['NDC_KEY'], inplace=True)
-
-mapped_count = df_nadac['RXCUI'].notna().sum()
-success_rate = mapped_count / initial_rows if initial_rows > 0 else 0
-
-print(f"    total NADAC rows: {initial_rows:,}")
-print(f"    successfully mapped to RxCUI: {mapped_count:,}")
-print(f"    RxCUI mapping success rate: {success_rate:.2%}")
-
-
-# STEP 4: data cleaning and relationship mapping
-print("\n[4/5] Cleaning data and mapping relationships...")
-
-price_col = next(col for col in ['New NADAC Per Unit', 'Old NADAC Per Unit'] if col in df_nadac.columns)
-date_col = next(col for col in ['Effective Date', 'Effective_Date'] if col in df_nadac.columns)
-classification_col = next(col for col in ['Classification for Rate Setting', 'Classification'] if col in df_nadac.columns)
-
-df_nadac.rename(columns={
-    'NDC Description': 'Name',
-    price_col: 'Price',
-    date_col: 'Date',
-}, inplace=True)
-
-df_processed = df_nadac[df_nadac['RXCUI'].notna()].copy()
-df_processed['Price'] = pd.to_numeric(df_processed['Price'], errors='coerce')
-df_processed = df_processed[df_processed['Price'] > 0].copy()
-df_processed.dropna(subset=['Date'], inplace=True)
-df_processed['RXCUI'] = df_processed['RXCUI'].astype(str).str.strip()
-df_processed['Date'] = df_processed['Date'].astype(str).str.strip()
-df_processed['IsBrand'] = (df_processed[classification_col].str.strip().str.upper() == 'B')
-
-
-print("    mapping brand/generic relationships with fallback logic...")
-
-def find_related_rxcui(rxcui, is_brand):
-    rxcui = str(rxcui).strip()
-    brand_rxcui = None
-    generic_rxcui = None
-
-    if is_brand:
-        brand_rxcui = rxcui
-        generic_rxcui = brand_to_generic_map.get(rxcui)
-        if not generic_rxcui:
-            generic_rxcui = generic_to_brand_map.get(rxcui)
-    else:
-        generic_rxcui = rxcui
-        brand_rxcui = generic_to_brand_map.get(rxcui)
-        if not brand_rxcui:
-            brand_rxcui = brand_to_generic_map.get(rxcui)
-
-    return brand_rxcui, generic_rxcui
-
-results = df_processed.apply(
-    lambda row: find_related_rxcui(row['RXCUI'], row['IsBrand']), 
-    axis=1
-)
-df_processed['Brand_RxCUI'] = results.apply(lambda x: x[0] if x[0] else '')
-df_processed['Generic_RxCUI'] = results.apply(lambda x: x[1] if x[1] else '')
-
-
-df_processed['Ingredient_RxCUI_Internal'] = df_processed['RXCUI'].map(product_to_ingredient_map).fillna('')
-df_processed['Manufacturer_Name'] = df_processed['RXCUI'].map(manuf_name_lookup).fillna('') 
-df_processed['Strength'] = df_processed['RXCUI'].map(strength_lookup).fillna('')
-df_processed['Form'] = df_processed['RXCUI'].map(form_lookup).fillna('')
-
-df_processed['Name'] = df_processed['RXCUI'].map(name_lookup).fillna(df_processed['Name'])
-
-
-# manufacturer fallback
-manufacturer_pattern = r'\[([^\]]+)\]'
-mask_missing_manuf = (df_processed['Manufacturer_Name'] == '')
-
-if mask_missing_manuf.any():
-    print("    applying vectorized regex fallback for missing manufacturer (extracting [bracketed name])...")
-    
-    def get_first_bracketed(name_series):
-        matches = name_series.str.findall(manufacturer_pattern)
-        return matches.apply(lambda x: x[0] if x else '')
-
-    manufacturer_fb = get_first_bracketed(df_processed.loc[mask_missing_manuf, 'Name'])
-
-    df_processed.loc[mask_missing_manuf, 'Manufacturer_Name'] = np.where(
-        df_processed.loc[mask_missing_manuf, 'Manufacturer_Name'] == '',
-        manufacturer_fb,
-        df_processed.loc[mask_missing_manuf, 'Manufacturer_Name']
-    )
-
-# strength/form fallback
-mask_missing_strength_form = (df_processed['Strength'] == '') | (df_processed['Form'] == '')
-
-if mask_missing_strength_form.any():
-    print("    applying comprehensive regex fallback for missing strength/form...")
-    
-    strength_pattern = r'(\d+\.?\d*\s*[A-Z]{1,4}(?:/[A-Z]{1,4})?)'
-    
-    form_words = [
-        'Extended Release Oral Tablet',
-        'Extended Release Oral Capsule',
-        'Disintegrating Oral Tablet',
-        'Delayed Release Oral Tablet',
-        'Delayed Release Oral Capsule',
-        'Metered Dose Nasal Spray',
-        'Powder for Oral Suspension',
-        'Mucous Membrane Topical Solution',
-        'Inhalant Powder for Oral Inhalation',
-        'Metered Dose Inhaler',
-        'Dry Powder Inhaler',
-        'Injectable Solution',
-        'Injectable Suspension',
-        'Intraperitoneal Solution',
-        'Prefilled Syringe',
-        'Pen Injector',
-        'Transdermal System',
-        'Ophthalmic Solution',
-        'Ophthalmic Suspension',
-        'Ophthalmic Ointment',
-        'Oral Tablet',
-        'Oral Capsule',
-        'Oral Solution',
-        'Oral Suspension',
-        'Oral Lozenge',
-        'Oral Granules',
-        'Oral Powder',
-        'Oral Pellet',
-        'Oral Gel',
-        'Chewable Tablet',
-        'Sublingual Tablet',
-        'Topical Cream',
-        'Topical Gel',
-        'Topical Ointment',
-        'Topical Solution',
-        'Topical Lotion',
-        'Topical Spray',
-        'Topical Foam',
-        'Topical Powder',
-        'Nasal Spray',
-        'Rectal Suppository',
-        'Medicated Pad',
-        'Medicated Shampoo',
-        'Medicated Patch',
-        'Medicated Liquid Soap',
-        'Inhalation Solution',
-        'Drug Implant',
-        'Mucosal Spray',
-        'Tablet',
-        'Capsule',
-        'Injection',
-        'Solution',
-        'Suspension',
-        'Ointment',
-        'Cream',
-        'Lotion',
-        'Syrup',
-        'Powder',
-        'Aerosol',
-        'Patch',
-        'Gel',
-        'Kit',
-        'Vial',
-        'Cartridge',
-        'Injector',
-        'Mouthwash',
-    ]
-    form_pattern = r'\b(' + '|'.join(form_words) + r')(?:\s*\[|$)'
-
-    strength_fb = df_processed.loc[mask_missing_strength_form, 'Name'].str.extract(
-        strength_pattern, expand=False, flags=re.IGNORECASE
-    ).fillna('')
-
-    form_fb = df_processed.loc[mask_missing_strength_form, 'Name'].str.extract(
-        form_pattern, expand=False, flags=re.IGNORECASE
-    ).fillna('')
-    
-    df_processed.loc[mask_missing_strength_form, 'Strength'] = np.where(
-        df_processed.loc[mask_missing_strength_form, 'Strength'] == '',
-        strength_fb,
-        df_processed.loc[mask_missing_strength_form, 'Strength']
-    )
-
-    df_processed.loc[mask_missing_strength_form, 'Form'] = np.where(
-        df_processed.loc[mask_missing_strength_form, 'Form'] == '',
-        form_fb,
-        df_processed.loc[mask_missing_strength_form, 'Form']
-    )
-
-
-missing_name = df_processed['Manufacturer_Name'].eq('').sum()
-missing_strength = df_processed['Strength'].eq('').sum()
-missing_form = df_processed['Form'].eq('').sum()
-
-print(f"    diagnostics on mapped attributes (total rows: {len(df_processed):,})")
-print(f"      rows missing manufacturer (name): {missing_name:,}")
-print(f"      rows missing strength: {missing_strength:,}")
-print(f"      rows missing form: {missing_form:,}")
-
-print(f"    data cleaned and attributes mapped. {len(df_processed):,} rows remaining in pipeline.")
+name_lookup = stage_results['rxnconso']['name_lookup']
+df_processed = stage_results['enriched']
+del stage_results
 
 
 # STEP 5: grouping and JSON output
 print("\n[5/5] Grouping and writing JSON files...")
 
+# PREPROCESS_PRICE_ENCODING=change_points stores each NDC series as the dates a new price takes effect
+# (see price_encoding.py); the default keeps every effective date
+PRICE_ENCODING = os.environ.get('PREPROCESS_PRICE_ENCODING', 'full')
+if PRICE_ENCODING not in ('full', CHANGE_POINTS):
+    raise ValueError(f"PREPROCESS_PRICE_ENCODING must be 'full' or '{CHANGE_POINTS}', got '{PRICE_ENCODING}'")
+print(f"    price encoding: {PRICE_ENCODING}")
+
 OUTPUT_COLS = ['NDC', 'Price', 'Date', 'RXCUI', 'Name', 'IsBrand', 'Brand_RxCUI', 
                'Generic_RxCUI', 'Manufacturer_Name', 'Strength', 'Form'] 
 df_final = df_processed[OUTPUT_COLS].copy()
@@ -419,10 +118,11 @@ def build_drug_data(group):
             if not valid_manufs_series.empty:
                 best_manufacturer_name = str(valid_manufs_series.mode().iloc[0])
 
-    ingredient_rxcui_internal = str(first_row['Ingredient_RxCUI_Internal']) if first_row['Ingredient_RxCUI_Internal'] else ""
+    ingredient_rxcuis = list(first_row['Ingredient_RxCUIs'])
     full_drug_name = str(first_row['Name'])
     
-    ingredient_name = name_lookup.get(ingredient_rxcui_internal, "")
+    ingredient_names = [name_lookup[i] for i in ingredient_rxcuis if name_lookup.get(i)]
+    ingredient_name = " / ".join(ingredient_names)
     
     if not ingredient_name:
         temp_name = full_drug_name
@@ -441,6 +141,7 @@ def build_drug_data(group):
 
     strength = str(first_row['Strength']) if pd.notna(first_row['Strength']) else ""
     form = str(first_row['Form']) if pd.notna(first_row['Form']) else ""
+    form_category = str(first_row['Form_Category']) if pd.notna(first_row['Form_Category']) else "Other"
 
     return {
         "RxCUI": rxcui,
@@ -449,9 +150,12 @@ def build_drug_data(group):
         "Brand_RxCUI": brand_rxcui,
         "Generic_RxCUI": generic_rxcui, 
         "Ingredient_Name": ingredient_name,
+        "Ingredient_RxCUIs": ingredient_rxcuis,
         "Manufacturer_Name": best_manufacturer_name, 
         "Strength": strength,
         "Form": form,
+        "Form_Category": form_category,
+        "Dose_Form_Groups": list(first_row['Dose_Form_Groups']),
         "prices": prices_nested
     }
 
@@ -464,16 +168,47 @@ processed_count = 0
 created_files = set()
 comparison_map = {} 
 
+# RxCUIs already written from this exact enriched frame by this exact writer code, so a rerun after
+# a crash picks up where it stopped; the progress file is removed once every file has been written
+already_written = set()
+progress_file = None
+write_failed = False
+if CHECKPOINT_DIR:
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    writer_digest = hashlib.sha256(f"{stage_keys(load_stages)['enriched']}|{PRICE_ENCODING}".encode())
+    for source in [__file__, price_encoding.__file__]:
+        with open(source, 'rb') as f:
+            writer_digest.update(f.read())
+    progress_path = os.path.join(CHECKPOINT_DIR, f"written-{writer_digest.hexdigest()[:16]}.txt")
+    for filename in os.listdir(CHECKPOINT_DIR):
+        if filename.startswith('written-') and filename != os.path.basename(progress_path):
+            os.remove(os.path.join(CHECKPOINT_DIR, filename))
+    if os.path.exists(progress_path):
+        with open(progress_path, 'r') as f:
+            already_written = {line.strip() for line in f if line.strip()}
+        print(f"    resuming: {len(already_written):,} RxCUIs already written")
+    progress_file = open(progress_path, 'a')
+
 for rxcui, group in tqdm(grouped_data, desc="Writing JSON Files"):
     try:
-        data = build_drug_data(group)
         filename = os.path.join(PRICES_DIR, f'{rxcui}.json')
+        if str(rxcui) in already_written and os.path.exists(filename):
+            processed_count += 1
+            created_files.add(rxcui)
+            continue
+
+        data = build_drug_data(group)
+        if PRICE_ENCODING == CHANGE_POINTS:
+            data = encode_drug(data)
         
         with open(filename, 'w') as f:
             json.dump(data, f, indent=2)
             
         processed_count += 1
         created_files.add(rxcui)
+        if progress_file:
+            progress_file.write(f"{rxcui}\n")
+            progress_file.flush()
 
         brand_RxCUI = data['Brand_RxCUI']
         generic_RxCUI = data['Generic_RxCUI']
@@ -483,8 +218,15 @@ for rxcui, group in tqdm(grouped_data, desc="Writing JSON Files"):
         print(f"\nERROR on RxCUI {rxcui}: {e}")
         import traceback
         traceback.print_exc()
+        write_failed = True
         break  # stop after first error so we can see it
 
+if progress_file:
+    progress_file.close()
+    # a finished run leaves nothing to resume, so later runs always rewrite every file
+    if not write_failed:
+        os.remove(progress_path)
+
 print("\n" + "=" * 60)
 print("PREPROCESSING COMPLETE!")
 print("=" * 60)
@@ -493,16 +235,17 @@ print(f"created: {len(created_files):,} unique drug JSON files")
 
 
 if created_files:
-    print("\n[BONUS] Creating three search indexes...")
+    print("\n[BONUS] Creating four search indexes...")
     
     search_index_all = {}
     search_index_has_pair = {} 
+    ingredient_index = {}
     
     for filename in os.listdir(PRICES_DIR):
         if filename.endswith('.json'):
             try:
                 with open(os.path.join(PRICES_DIR, filename), 'r') as f:
-                    data = json.load(f)
+                    data = decode_drug(json.load(f))
 
                 drug_name_raw = data.get('Name', '')
                 rxcui = data.get('RxCUI')
@@ -548,11 +291,23 @@ if created_files:
                     "manufacturer_name": manufacturer_name, 
                     "most_recent_price": most_recent_price
                     ,"form": data.get("Form", "")
-                    ,"formCategory": categorize_dosage_form(data.get("Form", ""))
+                    ,"formCategory": data.get("Form_Category") or categorize_dosage_form(data.get("Form", ""))
                 }
 
                 search_index_all[rxcui] = entry
 
+                # inverted index: ingredient RxCUI -> every product containing it
+                for ingredient_rxcui in data.get('Ingredient_RxCUIs', []):
+                    ingredient_entry = ingredient_index.setdefault(ingredient_rxcui, {
+                        "name": name_lookup.get(ingredient_rxcui, ""),
+                        "products": []
+                    })
+                    ingredient_entry["products"].append({
+                        "rxcui": rxcui,
+                        "is_brand": is_brand,
+                        "formCategory": entry["formCategory"]
+                    })
+
                 if has_valid_pair:
                     tag = 'BRAND' if is_brand else 'GENERIC'
                     unique_search_key = f"{drug_name_raw.lower()} [{tag}]"
@@ -575,5 +330,50 @@ if created_files:
     with open(comparison_map_path, 'w') as f:
         json.dump(comparison_map, f, indent=2)
     print(f"created index 3 (brand/generic comparison map) with {len(comparison_map):,} entries.")
+
+    ingredient_index_path = os.path.join(DATA_DIR, 'ingredient_index.json')
+    with open(ingredient_index_path, 'w') as f:
+        json.dump(ingredient_index, f, indent=2)
+    print(f"created index 4 (ingredient RxCUI -> products) with {len(ingredient_index):,} ingredients.")
     
-    print(f"saved all indexes to: {DATA_DIR}/")
\ No newline at end of file
+    print(f"saved all indexes to: {DATA_DIR}/")
+
+
+# bundle the per-drug files into packs by brand or ingredient so the site fetches related drugs together
+if created_files:
+    print("\n[BONUS] Packing price files into bundles...")
+    packs_manifest = build_price_packs(PRICES_DIR, os.path.join(DATA_DIR, 'packs'))
+    print(f"    packed {len(packs_manifest['rxcuis']):,} drugs into {len(packs_manifest['packs'])} packs")
+
+# price change events over every NDC series (replaces the sampled client-side scan)
+print("\n[BONUS] Detecting price change events across all drugs...")
+price_events_path = os.path.join(DATA_DIR, 'price_events.json')
+price_event_steps_path = os.path.join(DATA_DIR, 'price_event_steps.json')
+price_events, price_event_steps = write_price_events(df_processed, price_events_path, price_event_steps_path)
+print(f"    {len(price_event_steps['rows']):,} step changes, {len(price_events['drugs']):,} drugs with moves")
+print(f"    saved events to: {price_events_path}")
+print(f"    saved steps to: {price_event_steps_path}")
+
+
+# per-drug summary stats with CPI-adjusted prices (replaces per-drug client-side inflation math)
+print("\n[BONUS] Computing summary statistics and inflation-adjusted prices...")
+summary_stats_path = os.path.join(DATA_DIR, 'summary_stats.json')
+summary_stats = write_summary_stats(df_processed, summary_stats_path)
+print(f"    summarized {len(summary_stats):,} drugs")
+print(f"    saved summary stats to: {summary_stats_path}")
+
+
+# top-N cross-drug rankings for the headline views, reusing the summary table above
+print("\n[BONUS] Ranking drugs across metrics, form categories and years...")
+rankings_dir = os.path.join(DATA_DIR, 'rankings')
+rankings = write_rankings(df_processed, rankings_dir, summary=summary_stats)
+print(f"    wrote {len(rankings)} rankings")
+print(f"    saved rankings to: {rankings_dir}/")
+
+
+# sharded NDC -> RxCUI / labeler / latest price index, so a label NDC resolves without scanning price files
+print("\n[BONUS] Writing NDC lookup index...")
+ndc_index_dir = os.path.join(DATA_DIR, 'ndc')
+ndc_table = write_ndc_index(df_processed, ndc_index_dir)
+print(f"    indexed {len(ndc_table):,} NDCs")
+print(f"    saved NDC index to: {ndc_index_dir}/")
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Optional change-point encoding for the per-drug price series
+an encoded file keeps only the dates where a new price takes effect. prices keeps its usual
+{ndc: {date: price}} shape, prices_encoding marks the file, prices_dates lists every date the drug
+was priced on and prices_last holds an NDC's last observed date when that is later than its last
+change, so "price at date D" stays answerable by binary search and decoding onto prices_dates
+gives back the original series. files that wouldn't decode back exactly (an NDC missing dates
+inside its range) or wouldn't get smaller are left unencoded.
+
+nadac-comparison.csv already lists only price changes, so series built from it have almost no
+repeats and files are left as they are; the encoding pays off
+for series built from the weekly NADAC files, which repeat every price until it changes
+"""
+
+import argparse
+import bisect
+import json
+import os
+from datetime import datetime
+
+CHANGE_POINTS = 'change_points'
+DATE_FORMAT = '%m/%d/%Y'
+
+
+def date_key(date_str):
+    # NADAC dates are MM/DD/YYYY strings, turn them into sortable ordinals
+    return datetime.strptime(date_str.strip(), DATE_FORMAT).toordinal()
+
+
+def _sorted_points(dates):
+    return sorted(dates.items(), key=lambda item: date_key(item[0]))
+
+
+def encode_change_points(prices):
+    """
+    {ndc: {date: price}} -> (change points in the same shape, {ndc: last observed date})
+    last dates are only kept for NDCs observed after their last change
+    """
+    encoded, last_dates = {}, {}
+    for ndc, dates in prices.items():
+        points = _sorted_points(dates)
+        if not points:
+            continue
+        changes = {}
+        previous = None
+        for date, price in points:
+            if price != previous:
+                changes[date] = price
+                previous = price
+        encoded[ndc] = changes
+        if points[-1][0] not in changes:
+            last_dates[ndc] = points[-1][0]
+    return encoded, last_dates
+
+
+def change_point_series(changes):
+    """sorted (date ordinals, prices) for one NDC, ready for price_at"""
+    points = _sorted_points(changes)
+    return [date_key(date) for date, _ in points], [price for _, price in points]
+
+
+def price_at(keys, prices, date, last=None):
+    """
+    price in effect on date (MM/DD/YYYY) for one NDC's change points, or None outside the series
+    last is the NDC's last observed date; without it the final price is carried forward indefinitely
+    """
+    target = date_key(date)
+    if last is not None and target > date_key(last):
+        return None
+    idx = bisect.bisect_right(keys, target) - 1
+    return prices[idx] if idx >= 0 else None
+
+
+def decode_change_points(encoded, last_dates, dates=None):
+    """
+    expand change points back to a price on every date in dates, clipped to each NDC's own range
+    dates should be the drug's calendar (prices_dates); without it only the change dates and last
+    dates come back, so flat stretches between changes are missing
+    """
+    if dates is None:
+        dates = set(last_dates.values())
+        for changes in encoded.values():
+            dates.update(changes)
+    calendar = sorted(dates, key=date_key)
+
+    decoded = {}
+    for ndc, changes in encoded.items():
+        keys, prices = change_point_series(changes)
+        # without a last date the series ends at its last change
+        last = last_dates.get(ndc) or max(changes, key=date_key, default=None)
+        decoded[ndc] = {}
+        for date in calendar:
+            price = price_at(keys, prices, date, last)
+            if price is not None:
+                decoded[ndc][date] = price
+    return decoded
+
+
+def _json_size(data):
+    # same layout as the per-drug files on disk
+    return len(json.dumps(data, indent=2))
+
+
+def encode_drug(data):
+    """
+    drug record with its prices replaced by change points plus the drug's date calendar
+    returned unchanged when already encoded, when it wouldn't decode back to the same series
+    or when encoding would not make the file smaller
+    """
+    if data.get('prices_encoding') == CHANGE_POINTS:
+        return data
+    prices = data.get('prices', {})
+    encoded, last_dates = encode_change_points(prices)
+    calendar = set()
+    for dates in prices.values():
+        calendar.update(dates)
+
+    encoded_data = dict(data)
+    encoded_data['prices'] = encoded
+    encoded_data['prices_encoding'] = CHANGE_POINTS
+    encoded_data['prices_dates'] = sorted(calendar, key=date_key)
+    if last_dates:
+        encoded_data['prices_last'] = last_dates
+    if _json_size(encoded_data) >= _json_size(data):
+        return data
+    if decode_drug(encoded_data)['prices'] != prices:
+        return data
+    return encoded_data
+
+
+def decode_drug(data, dates=None):
+    """drug record with full per-date prices again (no-op for files written without encoding)"""
+    if data.get('prices_encoding') != CHANGE_POINTS:
+        return data
+    data = dict(data)
+    calendar = data.pop('prices_dates', None)
+    data['prices'] = decode_change_points(data['prices'], data.pop('prices_last', {}), dates or calendar)
+    del data['prices_encoding']
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Encode or decode the per-drug price files in place.')
+    parser.add_argument('mode', choices=['encode', 'decode'])
+    parser.add_argument('--prices-dir', default=os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'lib', 'data', 'prices'))
+    args = parser.parse_args()
+
+    convert = encode_drug if args.mode == 'encode' else decode_drug
+    before = after = changed = total = 0
+    for filename in os.listdir(args.prices_dir):
+        if not filename.endswith('.json'):
+            continue
+        path = os.path.join(args.prices_dir, filename)
+        before += os.path.getsize(path)
+        total += 1
+        with open(path, 'r') as f:
+            data = json.load(f)
+        converted = convert(data)
+        if converted is not data:
+            changed += 1
+            with open(path, 'w') as f:
+                json.dump(converted, f, indent=2)
+        after += os.path.getsize(path)
+
+    print(f"{args.mode}d {changed:,} of {total:,} price files: "
+          f"{before / 1024 ** 2:.1f} MB -> {after / 1024 ** 2:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
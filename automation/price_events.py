@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Price change event detection over every NDC series at once
+replaces the sampled, in-browser scans in DropChart / Headlines with a precomputed table
+
+price_events.json holds each drug's largest moves, the file the site loads. the step changes
+go to price_event_steps.json, capped to each drug's largest few so the table stays small
+"""
+
+import argparse
+import json
+import os
+
+from price_frame import DATA_DIR, PRICES_DIR, load_price_frame, prepare_price_frame
+
+# prices are per unit, same as the per-drug JSON
+DEFAULT_PCT_THRESHOLD = 25.0
+DEFAULT_DOLLAR_THRESHOLD = 0.10
+# all 65k steps on the shipped data come to ~4 MB, five per drug to ~0.5 MB
+DEFAULT_MAX_STEPS_PER_DRUG = 5
+
+EXTREMES = [
+    ('largest_increase_pct', 'PctChange', 'idxmax'),
+    ('largest_drop_pct', 'PctChange', 'idxmin'),
+    ('largest_increase_dollar', 'DollarChange', 'idxmax'),
+    ('largest_drop_dollar', 'DollarChange', 'idxmin'),
+]
+
+
+def compute_price_changes(df):
+    """one row per consecutive pair of effective dates within each NDC series"""
+    df = prepare_price_frame(df)
+    grouped = df.groupby(['RXCUI', 'NDC'], sort=False)
+    df['PrevPrice'] = grouped['Price'].shift()
+    df['PrevDate'] = grouped['Date'].shift()
+    df = df[df['PrevPrice'].notna()].copy()
+    df['DollarChange'] = df['Price'] - df['PrevPrice']
+    df['PctChange'] = df['DollarChange'] / df['PrevPrice'] * 100
+    return df.reset_index(drop=True)
+
+
+def detect_price_events(df, pct_threshold=DEFAULT_PCT_THRESHOLD, dollar_threshold=DEFAULT_DOLLAR_THRESHOLD,
+                        max_steps=DEFAULT_MAX_STEPS_PER_DRUG):
+    """
+    returns (steps, extremes)
+    steps: changes at or above both thresholds, at most max_steps per drug (largest |percent| first)
+    extremes: {label: frame} with each drug's largest percent / dollar move up and down
+    """
+    changes = compute_price_changes(df)
+
+    steps = changes[
+        (changes['PctChange'].abs() >= pct_threshold) &
+        (changes['DollarChange'].abs() >= dollar_threshold)
+    ]
+    if max_steps is not None:
+        # keep each drug's largest moves, back in series order
+        steps = (
+            steps.assign(_abs_pct=steps['PctChange'].abs())
+            .sort_values(['RXCUI', '_abs_pct'], ascending=[True, False], kind='mergesort')
+            .groupby('RXCUI', sort=False)
+            .head(max_steps)
+            .sort_index()
+            .drop(columns='_abs_pct')
+        )
+
+    extremes = {}
+    if not changes.empty:
+        by_drug = changes.groupby('RXCUI', sort=False)
+        for label, col, pick in EXTREMES:
+            frame = changes.loc[getattr(by_drug[col], pick)().values]
+            # a drug whose prices never rose has no "largest increase", and vice versa
+            frame = frame[frame[col] > 0] if pick == 'idxmax' else frame[frame[col] < 0]
+            extremes[label] = frame
+
+    return steps, extremes
+
+
+def _event(row):
+    return {
+        "ndc": row.NDC,
+        "date": row.Date,
+        "prev_date": row.PrevDate,
+        "from": round(float(row.PrevPrice), 5),
+        "to": round(float(row.Price), 5),
+        "dollar_change": round(float(row.DollarChange), 5),
+        "pct_change": round(float(row.PctChange), 2),
+    }
+
+
+def build_events_json(extremes, pct_threshold, dollar_threshold):
+    drugs = {}
+    for label, frame in extremes.items():
+        for row in frame.itertuples(index=False):
+            drugs.setdefault(row.RXCUI, {})[label] = _event(row)
+
+    return {
+        "thresholds": {"pct": pct_threshold, "dollar_per_unit": dollar_threshold},
+        "drugs": drugs,
+    }
+
+
+def build_steps_json(steps, pct_threshold, dollar_threshold, max_steps):
+    return {
+        "thresholds": {"pct": pct_threshold, "dollar_per_unit": dollar_threshold},
+        "max_per_drug": max_steps,
+        "columns": ["rxcui", "ndc", "date", "from", "to", "pct_change"],
+        "rows": [
+            [row.RXCUI, row.NDC, row.Date, round(float(row.PrevPrice), 5),
+             round(float(row.Price), 5), round(float(row.PctChange), 2)]
+            for row in steps.itertuples(index=False)
+        ],
+    }
+
+
+def write_price_events(df, path, steps_path, pct_threshold=DEFAULT_PCT_THRESHOLD,
+                       dollar_threshold=DEFAULT_DOLLAR_THRESHOLD, max_steps=DEFAULT_MAX_STEPS_PER_DRUG):
+    """write the per-drug extremes to path and the capped step table to steps_path; returns both"""
+    steps, extremes = detect_price_events(df, pct_threshold, dollar_threshold, max_steps)
+    events = build_events_json(extremes, pct_threshold, dollar_threshold)
+    steps_output = build_steps_json(steps, pct_threshold, dollar_threshold, max_steps)
+    with open(path, 'w') as f:
+        json.dump(events, f, separators=(',', ':'))
+    with open(steps_path, 'w') as f:
+        json.dump(steps_output, f, separators=(',', ':'))
+    return events, steps_output
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Detect price change events across every drug.')
+    parser.add_argument('--prices-dir', default=PRICES_DIR)
+    parser.add_argument('--out', default=os.path.join(DATA_DIR, 'price_events.json'))
+    parser.add_argument('--steps-out', default=os.path.join(DATA_DIR, 'price_event_steps.json'))
+    parser.add_argument('--pct', type=float, default=DEFAULT_PCT_THRESHOLD, help='minimum |percent change| for a step')
+    parser.add_argument('--dollar', type=float, default=DEFAULT_DOLLAR_THRESHOLD, help='minimum |per-unit change| for a step')
+    parser.add_argument('--max-steps', type=int, default=DEFAULT_MAX_STEPS_PER_DRUG,
+                        help='step changes kept per drug, largest first (0 keeps all)')
+    args = parser.parse_args()
+
+    print("Loading price series...")
+    df = load_price_frame(args.prices_dir)
+    print(f"    {len(df):,} price points across {df['RXCUI'].nunique():,} drugs")
+
+    events, steps = write_price_events(df, args.out, args.steps_out, args.pct, args.dollar, args.max_steps or None)
+    print(f"    {len(steps['rows']):,} step changes, {len(events['drugs']):,} drugs with moves")
+    print(f"saved events to: {args.out}")
+    print(f"saved steps to: {args.steps_out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""
+Shared helpers for pipeline stages that work on the long price table
+(one row per RxCUI / NDC / effective date)
+"""
+
+import json
+import os
+
+import pandas as pd
+
+from price_encoding import decode_drug
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'lib', 'data')
+PRICES_DIR = os.path.join(DATA_DIR, 'prices')
+
+PRICE_COLS = ['RXCUI', 'NDC', 'Date', 'Price', 'IsBrand']
+
+
+def load_price_frame(prices_dir=PRICES_DIR):
+    """rebuild the long price table from the generated per-drug JSON files (change-point files are expanded first)"""
+    rows = []
+    for filename in os.listdir(prices_dir):
+        if not filename.endswith('.json'):
+            continue
+        with open(os.path.join(prices_dir, filename), 'r') as f:
+            data = decode_drug(json.load(f))
+        rxcui = str(data.get('RxCUI'))
+        is_brand = bool(data.get('IsBrand', False))
+        for ndc, dates in data.get('prices', {}).items():
+            for date, price in dates.items():
+                rows.append((rxcui, ndc, date, price, is_brand))
+    return pd.DataFrame(rows, columns=PRICE_COLS)
+
+
+def prepare_price_frame(df):
+    """
+    keep the price columns, parse MM/DD/YYYY dates and sort each NDC series by date
+    duplicate (NDC, date) rows keep the last price, same as the per-drug JSON writer
+    """
+    df = df[PRICE_COLS].copy()
+    df['RXCUI'] = df['RXCUI'].astype(str)
+    df['Price'] = pd.to_numeric(df['Price'], errors='coerce')
+    df['DateParsed'] = pd.to_datetime(df['Date'], format='%m/%d/%Y', errors='coerce')
+    df = df.dropna(subset=['Price', 'DateParsed'])
+    df = df.drop_duplicates(subset=['RXCUI', 'NDC', 'Date'], keep='last')
+    return df.sort_values(['RXCUI', 'NDC', 'DateParsed'], kind='mergesort').reset_index(drop=True)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Pack the per-drug price JSON files into larger bundles
+drugs are grouped into families, a brand's products by the [Brand] in their names and generics
+by ingredient, so a view loading one brand's strengths and forms (or one ingredient's generics)
+gets them from a single small pack. a family is only split when it alone is over the target
+size, small families share a pack and form category only orders drugs within a family
+
+packs/manifest.json maps each RxCUI to [pack index, offset in that pack's array]
+"""
+
+import argparse
+import json
+import os
+import re
+
+from price_frame import DATA_DIR, PRICES_DIR
+
+PACKS_DIR = os.path.join(DATA_DIR, 'packs')
+# brand families are a few KB to a few dozen KB, so a pack stays a cheap fetch for one view;
+# ~45MB of compact price data lands at a few hundred packs
+DEFAULT_TARGET_PACK_BYTES = 128 * 1024
+BRAND_PATTERN = re.compile(r'\[([^\]]+)\]\s*$')
+
+
+def _family(data, entry):
+    """(0, brand name) for brand products, (1, ingredient) for generics"""
+    if data.get('IsBrand'):
+        brand = BRAND_PATTERN.search(data.get('Name', ''))
+        if brand:
+            return (0, brand.group(1).lower())
+    if data.get('Ingredient_RxCUIs'):
+        return (1, '|'.join(sorted(str(rxcui) for rxcui in data['Ingredient_RxCUIs'])))
+    return (1, (data.get('Ingredient_Name') or entry.get('ingredient_name') or '').lower())
+
+
+def _load_drugs(prices_dir):
+    # older price files have no Form_Category, fall back to the search index's formCategory
+    search_index = {}
+    search_index_path = os.path.join(os.path.dirname(os.path.normpath(prices_dir)), 'search_index_all.json')
+    if os.path.exists(search_index_path):
+        with open(search_index_path, 'r') as f:
+            search_index = json.load(f)
+
+    drugs = []
+    for filename in os.listdir(prices_dir):
+        if not filename.endswith('.json'):
+            continue
+        with open(os.path.join(prices_dir, filename), 'r') as f:
+            data = json.load(f)
+        rxcui = str(data.get('RxCUI'))
+        entry = search_index.get(rxcui, {})
+        category = data.get('Form_Category') or entry.get('formCategory') or 'Other'
+        drugs.append((_family(data, entry), category, rxcui, data))
+    return drugs
+
+
+def build_price_packs(prices_dir=PRICES_DIR, packs_dir=PACKS_DIR, target_bytes=DEFAULT_TARGET_PACK_BYTES):
+    os.makedirs(packs_dir, exist_ok=True)
+    # drop packs from the previous run so the manifest never points at stale files
+    for filename in os.listdir(packs_dir):
+        if filename.startswith('pack-') and filename.endswith('.json'):
+            os.remove(os.path.join(packs_dir, filename))
+
+    # family first, form category only as a tiebreak
+    drugs = sorted(_load_drugs(prices_dir), key=lambda d: (d[0], d[1], d[2]))
+    families = []
+    for family, _, rxcui, data in drugs:
+        if not families or families[-1][0] != family:
+            families.append((family, []))
+        families[-1][1].append((rxcui, data, len(json.dumps(data, separators=(',', ':')))))
+
+    packs = []
+    rxcui_index = {}
+    current, current_bytes = [], 0
+
+    def flush():
+        if not current:
+            return
+        pack_id = f'pack-{len(packs):03d}'
+        with open(os.path.join(packs_dir, f'{pack_id}.json'), 'w') as f:
+            json.dump([data for _, data in current], f, separators=(',', ':'))
+        for offset, (rxcui, _) in enumerate(current):
+            rxcui_index[rxcui] = [len(packs), offset]
+        packs.append({'id': pack_id, 'drugs': len(current), 'bytes': current_bytes})
+
+    for _, members in families:
+        family_bytes = sum(size for _, _, size in members)
+        # start a new pack rather than split a family across two
+        if current and current_bytes + family_bytes > target_bytes:
+            flush()
+            current, current_bytes = [], 0
+        for rxcui, data, size in members:
+            # only a family bigger than the target on its own spans several packs
+            if current and current_bytes + size > target_bytes:
+                flush()
+                current, current_bytes = [], 0
+            current.append((rxcui, data))
+            current_bytes += size
+    flush()
+
+    manifest = {'packs': packs, 'rxcuis': rxcui_index}
+    with open(os.path.join(packs_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, separators=(',', ':'))
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bundle per-drug price files into packs plus a manifest.')
+    parser.add_argument('--prices-dir', default=PRICES_DIR)
+    parser.add_argument('--out', default=PACKS_DIR)
+    parser.add_argument('--target-kb', type=int, default=DEFAULT_TARGET_PACK_BYTES // 1024)
+    args = parser.parse_args()
+
+    manifest = build_price_packs(args.prices_dir, args.out, args.target_kb * 1024)
+    print(f"packed {len(manifest['rxcuis']):,} drugs into {len(manifest['packs'])} packs")
+    print(f"saved packs to: {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Local price query service over the generated data in src/lib/data
+loads the search index once and keeps hot drug series in an LRU cache,
+so other tools can ask for prices without re-parsing the price files
+"""
+
+import argparse
+import bisect
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+
+from price_encoding import date_key, decode_drug
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'lib', 'data')
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+# in-memory cost of one cached point (ordinal key, (date, price) tuple, date string, float),
+# around five times what the point takes in the JSON file; list slots are counted with the lists
+POINT_BYTES = (sys.getsizeof(738000) + sys.getsizeof(('01/01/2024', 1.0))
+               + sys.getsizeof('01/01/2024') + sys.getsizeof(1.0))
+
+
+class LRUCache:
+    """LRU cache that evicts by total size (bytes) instead of entry count"""
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, value, size):
+        if key in self._entries:
+            self.current_bytes -= self._entries.pop(key)[1]
+        self._entries[key] = (value, size)
+        self.current_bytes += size
+
+        # always keep the newest entry, even if it alone is over budget
+        while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.current_bytes -= evicted_size
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+        self.current_bytes = 0
+
+
+def cached_size(data):
+    """estimated bytes a loaded record holds in memory, dominated by its series"""
+    size = sys.getsizeof(data) + sum(sys.getsizeof(value) for key, value in data.items() if key != 'prices')
+    for ndc, (keys, points) in data['prices'].items():
+        size += sys.getsizeof(ndc) + sys.getsizeof(keys) + sys.getsizeof(points) + len(points) * POINT_BYTES
+    return size
+
+
+class PriceQueryService:
+    """
+    answers ad-hoc price questions from the generated dataset
+    series are returned as {ndc: [(date, price), ...]} sorted by date
+    """
+
+    def __init__(self, data_dir=DATA_DIR, max_cache_bytes=DEFAULT_CACHE_BYTES):
+        self.data_dir = data_dir
+        self.prices_dir = os.path.join(data_dir, 'prices')
+        self.cache = LRUCache(max_cache_bytes)
+
+        self.hits = 0
+        self.misses = 0
+        self.latency = {}
+
+        with open(os.path.join(data_dir, 'search_index_all.json'), 'r') as f:
+            self.search_index = json.load(f)
+
+        # keyed by ingredient RxCUI and by lowercased ingredient name
+        self.ingredient_to_rxcuis = {}
+        ingredient_index_path = os.path.join(data_dir, 'ingredient_index.json')
+        if os.path.exists(ingredient_index_path):
+            with open(ingredient_index_path, 'r') as f:
+                ingredient_index = json.load(f)
+            for ingredient_rxcui, entry in ingredient_index.items():
+                rxcuis = [product['rxcui'] for product in entry['products']]
+                self.ingredient_to_rxcuis[ingredient_rxcui] = rxcuis
+                if entry.get('name'):
+                    self.ingredient_to_rxcuis.setdefault(entry['name'].lower(), []).extend(rxcuis)
+        else:
+            # older datasets without the inverted index, group by the display name instead
+            for rxcui, entry in self.search_index.items():
+                ingredient = (entry.get('ingredient_name') or '').lower()
+                if ingredient:
+                    self.ingredient_to_rxcuis.setdefault(ingredient, []).append(rxcui)
+
+    def _record(self, op, started):
+        count, total = self.latency.get(op, (0, 0.0))
+        self.latency[op] = (count + 1, total + time.perf_counter() - started)
+
+    def _load(self, rxcui):
+        filename = os.path.join(self.prices_dir, f'{rxcui}.json')
+        with open(filename, 'r') as f:
+            data = decode_drug(json.load(f))
+
+        series = {}
+        for ndc, dates in data.get('prices', {}).items():
+            points = sorted((date_key(d), d, p) for d, p in dates.items())
+            series[ndc] = (
+                [k for k, _, _ in points],
+                [(d, p) for _, d, p in points],
+            )
+        data['prices'] = series
+        return data, cached_size(data)
+
+    def drug(self, rxcui):
+        """full drug record with its series pre-sorted, or None if no price file exists"""
+        started = time.perf_counter()
+        rxcui = str(rxcui)
+        data = self.cache.get(rxcui)
+        if data is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            try:
+                data, size = self._load(rxcui)
+            except FileNotFoundError:
+                data = None
+            if data is not None:
+                self.cache.put(rxcui, data, size)
+        self._record('drug', started)
+        return data
+
+    def series(self, rxcui, start=None, end=None):
+        """per-NDC price points for one drug, optionally sliced to [start, end]"""
+        started = time.perf_counter()
+        data = self.drug(rxcui)
+        if data is None:
+            self._record('series', started)
+            return {}
+
+        lo_key = date_key(start) if start else None
+        hi_key = date_key(end) if end else None
+
+        result = {}
+        for ndc, (keys, points) in data['prices'].items():
+            lo = bisect.bisect_left(keys, lo_key) if lo_key is not None else 0
+            hi = bisect.bisect_right(keys, hi_key) if hi_key is not None else len(keys)
+            if lo < hi:
+                result[ndc] = points[lo:hi]
+        self._record('series', started)
+        return result
+
+    def prices_at(self, rxcui, date):
+        """per-NDC price in effect on date (MM/DD/YYYY), leaving out NDCs not priced yet or discontinued"""
+        started = time.perf_counter()
+        data = self.drug(rxcui)
+        result = {}
+        if data is not None:
+            target = date_key(date)
+            for ndc, (keys, points) in data['prices'].items():
+                idx = bisect.bisect_right(keys, target) - 1
+                if idx >= 0 and target <= keys[-1]:
+                    result[ndc] = points[idx][1]
+        self._record('prices_at', started)
+        return result
+
+    def batch_series(self, rxcuis, start=None, end=None):
+        started = time.perf_counter()
+        result = {str(rxcui): self.series(rxcui, start, end) for rxcui in rxcuis}
+        self._record('batch_series', started)
+        return result
+
+    def latest_prices(self, rxcuis):
+        """most recent per-unit price for each RxCUI, straight from the search index"""
+        started = time.perf_counter()
+        result = {}
+        for rxcui in rxcuis:
+            entry = self.search_index.get(str(rxcui))
+            result[str(rxcui)] = entry.get('most_recent_price') if entry else None
+        self._record('latest_prices', started)
+        return result
+
+    def rxcuis_for_ingredient(self, ingredient):
+        return list(self.ingredient_to_rxcuis.get(ingredient.lower(), []))
+
+    def ndcs_for_ingredient(self, ingredient, start=None, end=None):
+        """{rxcui: {ndc: points}} for every drug with the given ingredient (RxCUI or name)"""
+        started = time.perf_counter()
+        result = {}
+        for rxcui in self.rxcuis_for_ingredient(ingredient):
+            series = self.series(rxcui, start, end)
+            if series:
+                result[rxcui] = series
+        self._record('ndcs_for_ingredient', started)
+        return result
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.cache.evictions,
+            'cached_drugs': len(self.cache),
+            'cached_bytes': self.cache.current_bytes,
+            'max_cache_bytes': self.cache.max_bytes,
+            'latency_ms': {
+                op: {'calls': count, 'avg': round(total / count * 1000, 3)}
+                for op, (count, total) in self.latency.items()
+            },
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query the generated NADAC price data locally.')
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--cache-mb', type=int, default=DEFAULT_CACHE_BYTES // (1024 * 1024),
+                        help='memory budget for cached series (estimated in-memory size, not file size)')
+    parser.add_argument('--stats', action='store_true', help='print cache/latency counters to stderr')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    latest = sub.add_parser('latest', help='latest price for one or more RxCUIs')
+    latest.add_argument('rxcuis', nargs='+')
+
+    series = sub.add_parser('series', help='price series for one or more RxCUIs')
+    series.add_argument('rxcuis', nargs='+')
+    series.add_argument('--start', help='MM/DD/YYYY')
+    series.add_argument('--end', help='MM/DD/YYYY')
+
+    at = sub.add_parser('at', help='price of each NDC of an RxCUI on a given date')
+    at.add_argument('rxcui')
+    at.add_argument('date', help='MM/DD/YYYY')
+
+    ingredient = sub.add_parser('ingredient', help='all NDC series for an ingredient')
+    ingredient.add_argument('name', help='ingredient RxCUI or name')
+    ingredient.add_argument('--start', help='MM/DD/YYYY')
+    ingredient.add_argument('--end', help='MM/DD/YYYY')
+
+    args = parser.parse_args()
+    service = PriceQueryService(args.data_dir, args.cache_mb * 1024 * 1024)
+
+    if args.command == 'latest':
+        result = service.latest_prices(args.rxcuis)
+    elif args.command == 'series':
+        result = service.batch_series(args.rxcuis, args.start, args.end)
+    elif args.command == 'at':
+        result = service.prices_at(args.rxcui, args.date)
+    else:
+        result = service.ndcs_for_ingredient(args.name, args.start, args.end)
+
+    print(json.dumps(result, indent=2))
+    if args.stats:
+        print(json.dumps(service.stats(), indent=2), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Cross-drug top-N rankings for the headline views, selected with heaps over the summary table
+one small JSON file per metric under data/rankings/, each with an overall list plus lists per
+form category and per year, and an index.json listing what was written
+"""
+
+import argparse
+import heapq
+import json
+import math
+import os
+
+import pandas as pd
+
+from price_frame import DATA_DIR, PRICES_DIR, load_price_frame, prepare_price_frame
+from summary_stats import compute_summary_stats, load_cpi
+
+RANKINGS_DIR = os.path.join(DATA_DIR, 'rankings')
+DEFAULT_TOP_N = 10
+DRUG_COLS = ['RXCUI', 'Name', 'IsBrand', 'Generic_RxCUI', 'Form_Category']
+
+# name -> (label, column in the summary table, column in the yearly table or None, largest first)
+METRICS = {
+    'most_expensive': ('Most expensive per unit', 'latest_price', 'year_end_price', True),
+    'largest_increase_pct': ('Largest price increase (%)', 'pct_change', 'year_pct_change', True),
+    'largest_increase_dollar': ('Largest price increase ($)', 'dollar_change', 'year_dollar_change', True),
+    'largest_drop_pct': ('Largest price drop (%)', 'pct_change', 'year_pct_change', False),
+    'above_inflation': ('Furthest above inflation (%)', 'diff_vs_inflation_pct', None, True),
+    'brand_generic_gap': ('Biggest brand vs generic gap ($)', 'gap_dollars', None, True),
+}
+# change metrics only mean something for drugs priced on at least two dates
+CHANGE_COLUMNS = {'pct_change', 'dollar_change', 'diff_vs_inflation_pct', 'year_pct_change', 'year_dollar_change'}
+
+
+def drug_info_frame(df):
+    """one row of display attributes per RxCUI from the long pipeline frame"""
+    info = df.groupby('RXCUI', sort=False)[DRUG_COLS[1:]].first()
+    info.index = info.index.astype(str)
+    return info
+
+
+def load_drug_info(prices_dir=PRICES_DIR):
+    # older price files have no Form_Category, fall back to the search index's formCategory
+    search_index = {}
+    search_index_path = os.path.join(os.path.dirname(os.path.normpath(prices_dir)), 'search_index_all.json')
+    if os.path.exists(search_index_path):
+        with open(search_index_path, 'r') as f:
+            search_index = json.load(f)
+
+    rows = []
+    for filename in os.listdir(prices_dir):
+        if not filename.endswith('.json'):
+            continue
+        with open(os.path.join(prices_dir, filename), 'r') as f:
+            data = json.load(f)
+        rxcui = str(data.get('RxCUI'))
+        category = data.get('Form_Category') or search_index.get(rxcui, {}).get('formCategory') or 'Other'
+        rows.append((rxcui, data.get('Name', ''), bool(data.get('IsBrand', False)),
+                     data.get('Generic_RxCUI', ''), category))
+    return pd.DataFrame(rows, columns=DRUG_COLS).set_index('RXCUI')
+
+
+def compute_yearly_stats(df):
+    """per RxCUI and calendar year: price at the first and last date that year, and the change between them"""
+    df = prepare_price_frame(df)
+    per_date = df.groupby(['RXCUI', 'DateParsed'], sort=True)['Price'].mean().reset_index()
+    per_date['year'] = per_date['DateParsed'].dt.year
+    by_year = per_date.groupby(['RXCUI', 'year'], sort=False)
+    yearly = pd.DataFrame({
+        'year_start_price': by_year['Price'].first(),
+        'year_end_price': by_year['Price'].last(),
+        'num_dates': by_year.size(),
+    })
+    yearly['year_dollar_change'] = yearly['year_end_price'] - yearly['year_start_price']
+    yearly['year_pct_change'] = yearly['year_dollar_change'] / yearly['year_start_price'] * 100
+    return yearly.reset_index()
+
+
+def compute_brand_generic_gaps(summary, info):
+    """latest brand price minus latest price of its generic, for every brand with a priced generic"""
+    brands = info[info['IsBrand'] & info['Generic_RxCUI'].isin(summary.index)]
+    brands = brands[brands.index.isin(summary.index)]
+    gaps = pd.DataFrame({
+        'generic_rxcui': brands['Generic_RxCUI'],
+        'brand_price': summary.loc[brands.index, 'latest_price'],
+        'generic_price': summary.loc[brands['Generic_RxCUI'], 'latest_price'].to_numpy(),
+    }, index=brands.index)
+    gaps['gap_dollars'] = gaps['brand_price'] - gaps['generic_price']
+    gaps['gap_ratio'] = gaps['brand_price'] / gaps['generic_price']
+    return gaps
+
+
+def top_n(values, n, largest=True):
+    """
+    heap selection of the n best (value, rxcui) pairs, O(len * log n) instead of a full sort
+    NaN and infinite values are skipped, ties break on RxCUI
+    """
+    pairs = ((value, rxcui) for rxcui, value in values.items() if not (math.isnan(value) or math.isinf(value)))
+    if largest:
+        return heapq.nlargest(n, pairs)
+    return heapq.nsmallest(n, pairs)
+
+
+def _entry(rxcui, value, info, extra=None):
+    entry = {
+        'rxcui': rxcui,
+        'name': info.at[rxcui, 'Name'] if rxcui in info.index else '',
+        'formCategory': info.at[rxcui, 'Form_Category'] if rxcui in info.index else 'Other',
+        'value': round(float(value), 5),
+    }
+    if extra is not None:
+        entry.update(extra)
+    return entry
+
+
+def _ranked(values, n, largest, info, extra=None):
+    ranked = []
+    for value, rxcui in top_n(values, n, largest):
+        ranked.append(_entry(rxcui, value, info, extra(rxcui) if extra else None))
+    return ranked
+
+
+def build_rankings(summary, yearly, info, n=DEFAULT_TOP_N):
+    """{metric: {label, overall, byFormCategory, byYear}} with at most n entries per list"""
+    gaps = compute_brand_generic_gaps(summary, info)
+    categories = info['Form_Category'].fillna('Other').reindex(summary.index).fillna('Other')
+    multi_date = summary['num_dates'] >= 2
+
+    def gap_extra(rxcui):
+        row = gaps.loc[rxcui]
+        return {
+            'generic_rxcui': row['generic_rxcui'],
+            'brand_price': round(float(row['brand_price']), 5),
+            'generic_price': round(float(row['generic_price']), 5),
+            'gap_ratio': round(float(row['gap_ratio']), 2),
+        }
+
+    rankings = {}
+    for metric, (label, column, yearly_column, largest) in METRICS.items():
+        if column in gaps.columns:
+            values, extra = gaps[column], gap_extra
+        else:
+            values, extra = summary[column], None
+            if column in CHANGE_COLUMNS:
+                values = values[multi_date]
+
+        by_category = {}
+        for category, category_values in values.groupby(categories.reindex(values.index).fillna('Other')):
+            by_category[category] = _ranked(category_values, n, largest, info, extra)
+
+        by_year = {}
+        if yearly_column is not None:
+            year_frame = yearly
+            if yearly_column in CHANGE_COLUMNS:
+                year_frame = yearly[yearly['num_dates'] >= 2]
+            for year, group in year_frame.groupby('year'):
+                by_year[str(year)] = _ranked(group.set_index('RXCUI')[yearly_column], n, largest, info)
+
+        rankings[metric] = {
+            'metric': metric,
+            'label': label,
+            'overall': _ranked(values, n, largest, info, extra),
+            'byFormCategory': by_category,
+            'byYear': by_year,
+        }
+    return rankings
+
+
+def write_rankings(df, out_dir=RANKINGS_DIR, n=DEFAULT_TOP_N, cpi=None, info=None, summary=None):
+    """compute every ranking from the long price frame and write one file per metric plus index.json"""
+    if cpi is None:
+        cpi = load_cpi()
+    if summary is None:
+        summary = compute_summary_stats(df, cpi)
+    if info is None:
+        info = drug_info_frame(df)
+    rankings = build_rankings(summary, compute_yearly_stats(df), info, n)
+
+    os.makedirs(out_dir, exist_ok=True)
+    index = {'n': n, 'metrics': {}}
+    for metric, ranking in rankings.items():
+        with open(os.path.join(out_dir, f'{metric}.json'), 'w') as f:
+            json.dump(ranking, f, separators=(',', ':'))
+        index['metrics'][metric] = {
+            'label': ranking['label'],
+            'formCategories': sorted(ranking['byFormCategory']),
+            'years': sorted(ranking['byYear']),
+        }
+    with open(os.path.join(out_dir, 'index.json'), 'w') as f:
+        json.dump(index, f, indent=2)
+    return rankings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write top-N cross-drug rankings for the headline views.')
+    parser.add_argument('--prices-dir', default=PRICES_DIR)
+    parser.add_argument('--out', default=RANKINGS_DIR)
+    parser.add_argument('-n', '--top', type=int, default=DEFAULT_TOP_N, help='entries per ranked list')
+    args = parser.parse_args()
+
+    print("Loading price series...")
+    df = load_price_frame(args.prices_dir)
+    rankings = write_rankings(df, args.out, args.top, info=load_drug_info(args.prices_dir))
+    print(f"    wrote {len(rankings)} rankings")
+    print(f"saved rankings to: {args.out}")
+
+
+if __name__ == '__main__':
+    main()
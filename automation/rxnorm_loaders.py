@@ -0,0 +1,350 @@
+"""
+Loaders for the RxNorm RRF files and the NADAC CSV
+each load returns only the compact lookup tables the pipeline needs, so they can run
+in worker processes without shipping whole frames back to the parent
+"""
+
+import csv
+
+import pandas as pd
+
+# 'c' is pandas' default single-threaded parser producing object strings.
+# 'arrow' uses pyarrow's multi-threaded CSV reader and keeps columns Arrow-backed
+# (string[pyarrow]) through the filters and joins; values only become Python objects
+# when the lookup dicts are built for JSON output
+CSV_ENGINES = ['c', 'arrow']
+DEFAULT_CSV_ENGINE = 'c'
+
+RXNSAT_COLUMNS = [
+    'RXCUI', 'LUI', 'SUI', 'RXAUI', 'STYPE', 'CODE', 'ATUI',
+    'SATUI', 'ATN', 'SAB', 'ATV', 'SUPPRESS', 'CVF', 'EXTRA'
+]
+# attribute name of the labeler on MTHSPL (DailyMed SPL) atoms
+SPL_LABELER_ATN = 'LABELER'
+RXNCONSO_COLUMNS = [
+    'RXCUI', 'LAT', 'TS', 'LUI', 'STT', 'SUI', 'ISPREF', 'RXAUI', 'SAUI',
+    'SCUI', 'SDUI', 'SAB', 'TTY', 'CODE', 'STR', 'SRL', 'SUPPRESS', 'CVF'
+]
+CONSO_COLS = ['RXCUI', 'SAB', 'TTY', 'STR', 'SUPPRESS']
+RXNREL_COLUMNS = [
+    'RXCUI1', 'RXAUI1', 'STYPE1', 'REL', 'RXCUI2', 'RXAUI2',
+    'STYPE2', 'RELA', 'RUI', 'SRUI', 'SAB', 'SL', 'DIR',
+    'RG', 'SUPPRESS', 'CVF'
+]
+
+OFFICIAL_NAME_TTYS = ['SCD', 'SBD', 'PT', 'SCDF', 'SBDF', 'IN']
+SUPPRESSED_FLAGS = ['Y', 'O']
+
+INGREDIENT_TTYS = ['IN']
+COMPONENT_TTYS = ['SCDC', 'SBDC', 'SCDF', 'SBDF']
+INGREDIENT_RELAS = ['has_ingredient', 'ingredient_of']
+COMPONENT_RELAS = ['consists_of', 'constitutes', 'isa', 'inverse_isa']
+DOSE_FORM_RELAS = ['has_dose_form', 'dose_form_of']
+DOSE_FORM_GROUP_RELAS = ['has_doseformgroup', 'doseformgroup_of', 'isa', 'inverse_isa']
+BRAND_RELAS = ['tradename_of', 'brand_name_of', 'has_tradename', 'has_brand_name']
+
+# only these relationships are ever used, so RXNREL is filtered down to them at load time
+USED_RELAS = sorted(set(
+    INGREDIENT_RELAS + COMPONENT_RELAS + DOSE_FORM_RELAS + DOSE_FORM_GROUP_RELAS + BRAND_RELAS
+))
+
+NADAC_COLUMNS = [
+    'NDC', 'NDC Description',
+    'New NADAC Per Unit', 'Old NADAC Per Unit',
+    'Effective Date', 'Effective_Date',
+    'Classification for Rate Setting', 'Classification',
+]
+
+
+def clean_ndc(series):
+    return series.fillna('').str.replace('-', '', regex=False).str.strip().str.zfill(11)
+
+
+def normalize_ndc_series(series):
+    """11-digit NDCs, padding each segment of hyphenated label codes (4-4-2, 5-3-2, 5-4-1) on its own"""
+    series = series.fillna('').str.strip()
+    normalized = clean_ndc(series)
+    hyphenated = series.str.count('-') == 2
+    if hyphenated.any():
+        parts = series[hyphenated].str.split('-', expand=True)
+        normalized[hyphenated] = parts[0].str.zfill(5) + parts[1].str.zfill(4) + parts[2].str.zfill(2)
+    return normalized
+
+
+def _import_arrow_csv():
+    try:
+        import pyarrow as pa
+        import pyarrow.csv as pa_csv
+    except ImportError:
+        raise ImportError("the 'arrow' CSV engine needs pyarrow (pip install pyarrow)") from None
+    return pa, pa_csv
+
+
+def _check_engine(engine):
+    if engine not in CSV_ENGINES:
+        raise ValueError(f"unknown CSV engine '{engine}', expected one of {CSV_ENGINES}")
+
+
+def _arrow_to_pandas(table, pa):
+    return table.to_pandas(types_mapper={pa.string(): pd.StringDtype('pyarrow')}.get)
+
+
+def read_rrf(path, columns, all_columns, engine=DEFAULT_CSV_ENGINE):
+    """read the given columns of a pipe-delimited RRF file, every value as a string"""
+    _check_engine(engine)
+    usecols = [all_columns.index(c) for c in columns]
+
+    if engine == 'c':
+        # names only label the selected fields, so pandas reads them in file order
+        ordered = sorted(zip(usecols, columns))
+        df = pd.read_csv(path, sep='|', header=None, names=[c for _, c in ordered],
+                         usecols=[i for i, _ in ordered], dtype=str, low_memory=False)
+        return df[columns]
+
+    pa, pa_csv = _import_arrow_csv()
+    # RRF lines end with a trailing '|', so let Arrow name the fields f0..fN and pick by position
+    include = [f'f{i}' for i in usecols]
+    table = pa_csv.read_csv(
+        path,
+        read_options=pa_csv.ReadOptions(autogenerate_column_names=True, use_threads=True),
+        parse_options=pa_csv.ParseOptions(delimiter='|'),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=include,
+            column_types={name: pa.string() for name in include},
+            strings_can_be_null=True,
+        ),
+    )
+    return _arrow_to_pandas(table.rename_columns(columns), pa)
+
+
+def read_nadac_csv(path, columns, engine=DEFAULT_CSV_ENGINE):
+    """read whichever of the given columns the NADAC CSV has, every value as a string"""
+    _check_engine(engine)
+
+    if engine == 'c':
+        return pd.read_csv(path, dtype=str, usecols=lambda col: col in columns)
+
+    pa, pa_csv = _import_arrow_csv()
+    with open(path, 'r', newline='') as f:
+        header = next(csv.reader(f))
+    include = [col for col in header if col in columns]
+    table = pa_csv.read_csv(
+        path,
+        read_options=pa_csv.ReadOptions(use_threads=True),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=include,
+            column_types={name: pa.string() for name in include},
+            strings_can_be_null=True,
+        ),
+    )
+    return _arrow_to_pandas(table, pa)
+
+
+def load_rxnsat_lookups(path, engine=DEFAULT_CSV_ENGINE):
+    df_rxnsat = read_rrf(path, ['RXCUI', 'RXAUI', 'ATN', 'SAB', 'ATV'], RXNSAT_COLUMNS, engine)
+
+    # NDC to RxCUI map
+    df_rxcui_map = df_rxnsat[df_rxnsat['ATN'] == 'NDC'][['ATV', 'RXCUI']].copy()
+    df_rxcui_map['NDC_KEY'] = clean_ndc(df_rxcui_map['ATV'])
+    ndc_to_rxcui = dict(zip(df_rxcui_map['NDC_KEY'], df_rxcui_map['RXCUI']))
+    del df_rxcui_map
+    print(f"    created NDC-to-RxCUI map with {len(ndc_to_rxcui):,} unique NDC keys.")
+
+    # labeler per NDC: SPL atoms carry the NDC and the LABELER of that package side by side
+    df_spl = df_rxnsat[df_rxnsat['SAB'] == 'MTHSPL']
+    df_labels = df_spl[df_spl['ATN'] == SPL_LABELER_ATN][['RXAUI', 'ATV']].drop_duplicates(subset=['RXAUI'])
+    df_ndc_labels = df_spl[df_spl['ATN'] == 'NDC'][['RXAUI', 'ATV']].merge(
+        df_labels.rename(columns={'ATV': 'LABELER'}), on='RXAUI')
+    # SPL NDCs keep the hyphens of the label, so pad per segment instead of left-filling the digits
+    df_ndc_labels['NDC_KEY'] = normalize_ndc_series(df_ndc_labels['ATV'])
+    ndc_to_labeler = dict(zip(df_ndc_labels['NDC_KEY'], df_ndc_labels['LABELER']))
+    del df_spl, df_labels, df_ndc_labels
+    print(f"    created NDC-to-labeler map with {len(ndc_to_labeler):,} unique NDC keys.")
+    if not ndc_to_labeler:
+        print(f"    WARNING: no MTHSPL {SPL_LABELER_ATN} attributes matched an SPL NDC, labeler names will be empty")
+
+    df_manuf_name = df_rxnsat[
+        df_rxnsat['ATN'].isin(['LBL', 'MANU']) &
+        df_rxnsat['SAB'].isin(['RXNORM', 'MTHSPL'])
+    ][['RXCUI', 'ATV']].drop_duplicates(subset=['RXCUI'], keep='first')
+    manuf_name_lookup = dict(zip(df_manuf_name['RXCUI'], df_manuf_name['ATV']))
+    del df_manuf_name
+
+    df_strength = df_rxnsat[
+        df_rxnsat['ATN'].isin(['STRENGTH', 'SCD_STRING'])
+    ].sort_values(by=['ATN'], ascending=False).drop_duplicates(subset=['RXCUI'], keep='first')[['RXCUI', 'ATV']]
+    strength_lookup = dict(zip(df_strength['RXCUI'], df_strength['ATV']))
+    del df_strength
+
+    return {
+        'ndc_to_rxcui': ndc_to_rxcui,
+        'ndc_to_labeler': ndc_to_labeler,
+        'manuf_name_lookup': manuf_name_lookup,
+        'strength_lookup': strength_lookup,
+    }
+
+
+def load_rxnconso_lookups(path, engine=DEFAULT_CSV_ENGINE):
+    try:
+        df_rxnconso = read_rrf(path, CONSO_COLS, RXNCONSO_COLUMNS, engine)
+        print(f"    - RXNCONSO loaded with {len(df_rxnconso):,} rows.")
+    except FileNotFoundError:
+        print(f"    WARNING: {path} not found. Skipping official name mapping and TTY lookup.")
+        df_rxnconso = pd.DataFrame(columns=CONSO_COLS)
+    except ValueError as e:
+        print(f"    ERROR: Failed to read {path}. Check the number of pipe-separated fields against RXNCONSO_COLUMNS.")
+        print(f"    Original Error: {e}")
+        df_rxnconso = pd.DataFrame(columns=CONSO_COLS)
+
+    df_rxnorm = df_rxnconso[df_rxnconso['SAB'] == 'RXNORM']
+
+    # TTY lookup
+    df_tty = df_rxnorm[['RXCUI', 'TTY']].drop_duplicates(subset=['RXCUI'], keep='first')
+    rxcui_to_tty = dict(zip(df_tty['RXCUI'], df_tty['TTY']))
+
+    # official name lookup
+    df_official_names = df_rxnorm[
+        (df_rxnorm['TTY'].isin(OFFICIAL_NAME_TTYS)) &
+        (~df_rxnorm['SUPPRESS'].isin(SUPPRESSED_FLAGS))
+    ].drop_duplicates(subset=['RXCUI'], keep='first')[['RXCUI', 'STR']]
+    name_lookup = dict(zip(df_official_names['RXCUI'], df_official_names['STR']))
+    if name_lookup:
+        print(f"    extracted {len(name_lookup):,} official RxNorm names (including ingredients).")
+
+    # dose form (DF) and dose form group (DFG) names, resolved against RXNREL
+    df_form_names = df_rxnorm[df_rxnorm['TTY'].isin(['DF', 'DFG'])].drop_duplicates(subset=['RXCUI'], keep='first')
+    dose_form_name_lookup = dict(zip(df_form_names['RXCUI'], df_form_names['STR']))
+
+    return {
+        'rxcui_to_tty': rxcui_to_tty,
+        'name_lookup': name_lookup,
+        'dose_form_name_lookup': dose_form_name_lookup,
+    }
+
+
+def load_rxnrel_edges(path, engine=DEFAULT_CSV_ENGINE):
+    df_rxnrel = read_rrf(path, ['RXCUI1', 'RXCUI2', 'RELA', 'SAB'], RXNREL_COLUMNS, engine)
+    df_rxnrel = df_rxnrel[(df_rxnrel['SAB'] == 'RXNORM') & (df_rxnrel['RELA'].isin(USED_RELAS))]
+    print(f"    - RXNREL filtered to {len(df_rxnrel):,} RxNorm relationships.")
+    return df_rxnrel[['RXCUI1', 'RXCUI2', 'RELA']].reset_index(drop=True)
+
+
+def load_nadac(path, engine=DEFAULT_CSV_ENGINE):
+    df_nadac = read_nadac_csv(path, NADAC_COLUMNS, engine)
+    print(f"    - NADAC loaded with {len(df_nadac):,} rows.")
+    return df_nadac
+
+
+def orient_edges(df_edges, target_ttys, rxcui_to_tty):
+    # RXNREL lists each link in both directions, so use the TTY to tell which end is the target
+    df_edges = df_edges[['RXCUI1', 'RXCUI2']].drop_duplicates()
+    is_target1 = df_edges['RXCUI1'].map(rxcui_to_tty).isin(target_ttys)
+    is_target2 = df_edges['RXCUI2'].map(rxcui_to_tty).isin(target_ttys)
+    forward = df_edges.loc[is_target2 & ~is_target1, ['RXCUI1', 'RXCUI2']]
+    backward = df_edges.loc[is_target1 & ~is_target2, ['RXCUI2', 'RXCUI1']]
+    forward.columns = backward.columns = ['From', 'To']
+    return pd.concat([forward, backward], ignore_index=True).drop_duplicates()
+
+
+def build_ingredient_lookup(df_rxnrel, rxcui_to_tty):
+    # combination products have several ingredients, so keep every edge instead of one per product.
+    # SCD/SBD usually reach their ingredients through a component (SCDC) or form concept (SCDF),
+    # so join product -> component -> ingredient on top of the direct links
+    if rxcui_to_tty:
+        df_ingredient_edges = orient_edges(df_rxnrel[df_rxnrel['RELA'].isin(INGREDIENT_RELAS)], INGREDIENT_TTYS, rxcui_to_tty)
+        df_component_edges = orient_edges(df_rxnrel[df_rxnrel['RELA'].isin(COMPONENT_RELAS)], COMPONENT_TTYS, rxcui_to_tty)
+        df_two_hop = df_component_edges.merge(df_ingredient_edges, left_on='To', right_on='From', suffixes=('', '_ing'))
+        df_ingredient_graph = pd.concat([
+            df_ingredient_edges.rename(columns={'From': 'Product_RxCUI', 'To': 'Ingredient_RxCUI'}),
+            df_two_hop[['From', 'To_ing']].rename(columns={'From': 'Product_RxCUI', 'To_ing': 'Ingredient_RxCUI'}),
+        ], ignore_index=True).drop_duplicates()
+    else:
+        # no TTYs to orient with, fall back to reading has_ingredient as product -> ingredient
+        df_ingredient_graph = df_rxnrel[df_rxnrel['RELA'] == 'has_ingredient'][['RXCUI1', 'RXCUI2']].rename(
+            columns={'RXCUI1': 'Product_RxCUI', 'RXCUI2': 'Ingredient_RxCUI'}
+        ).drop_duplicates()
+
+    product_to_ingredients = (
+        df_ingredient_graph.sort_values('Ingredient_RxCUI')
+        .groupby('Product_RxCUI')['Ingredient_RxCUI']
+        .agg(list)
+        .to_dict()
+    )
+    print(f"    built ingredient graph: {len(df_ingredient_graph):,} edges over {len(product_to_ingredients):,} products")
+    return product_to_ingredients
+
+
+def build_dose_form_lookups(df_rxnrel, rxcui_to_tty, dose_form_name_lookup):
+    # RXNSAT has no DF attribute, but RXNREL links SCD/SBD to DF concepts (has_dose_form)
+    # and DF/products to dose form groups, so resolve forms with joins; name regex is only a fallback
+    if not (rxcui_to_tty and dose_form_name_lookup):
+        return {}, {}
+
+    df_dose_form_edges = orient_edges(df_rxnrel[df_rxnrel['RELA'].isin(DOSE_FORM_RELAS)], ['DF'], rxcui_to_tty)
+    df_group_edges = orient_edges(df_rxnrel[df_rxnrel['RELA'].isin(DOSE_FORM_GROUP_RELAS)], ['DFG'], rxcui_to_tty)
+
+    # a product reaches its groups either directly or through its DF
+    df_product_groups = pd.concat([
+        df_dose_form_edges.merge(df_group_edges, left_on='To', right_on='From', suffixes=('', '_grp'))[['From', 'To_grp']]
+            .rename(columns={'To_grp': 'To'}),
+        df_group_edges,
+    ], ignore_index=True).drop_duplicates()
+    df_product_groups['Group'] = df_product_groups['To'].map(dose_form_name_lookup)
+    df_product_groups = df_product_groups.dropna(subset=['Group'])
+
+    df_dose_form_edges['Form'] = df_dose_form_edges['To'].map(dose_form_name_lookup)
+    df_dose_form_edges = df_dose_form_edges.dropna(subset=['Form']).drop_duplicates(subset=['From'], keep='first')
+    form_lookup = dict(zip(df_dose_form_edges['From'], df_dose_form_edges['Form']))
+    dose_form_group_lookup = (
+        df_product_groups.sort_values('Group').groupby('From')['Group'].agg(list).to_dict()
+    )
+    return form_lookup, dose_form_group_lookup
+
+
+def build_brand_generic_lookups(df_rxnrel):
+    df_relationships = df_rxnrel[df_rxnrel['RELA'].isin(BRAND_RELAS)]
+
+    brand_to_generic_map = {}
+    generic_to_brand_map = {}
+
+    for _, row in df_relationships.iterrows():
+        rxcui1 = str(row['RXCUI1']).strip()
+        rxcui2 = str(row['RXCUI2']).strip()
+        rela = str(row['RELA']).strip()
+
+        if rela in ['tradename_of', 'brand_name_of']:
+            brand_to_generic_map[rxcui1] = rxcui2
+            if rxcui2 not in generic_to_brand_map:
+                generic_to_brand_map[rxcui2] = rxcui1
+        elif rela in ['has_tradename', 'has_brand_name']:
+            generic_to_brand_map[rxcui1] = rxcui2
+            if rxcui2 not in brand_to_generic_map:
+                brand_to_generic_map[rxcui2] = rxcui1
+
+    return brand_to_generic_map, generic_to_brand_map
+
+
+def build_relationship_lookups(df_rxnrel, conso_lookups):
+    rxcui_to_tty = conso_lookups['rxcui_to_tty']
+
+    print("    building product-to-ingredient graph...")
+    product_to_ingredients = build_ingredient_lookup(df_rxnrel, rxcui_to_tty)
+
+    print("    resolving dose forms and dose form groups from RXNREL...")
+    form_lookup, dose_form_group_lookup = build_dose_form_lookups(
+        df_rxnrel, rxcui_to_tty, conso_lookups['dose_form_name_lookup']
+    )
+    print(f"    resolved dose forms for {len(form_lookup):,} products, dose form groups for {len(dose_form_group_lookup):,}")
+
+    print("    building bidirectional relationship lookup tables...")
+    brand_to_generic_map, generic_to_brand_map = build_brand_generic_lookups(df_rxnrel)
+    print(f"    built {len(brand_to_generic_map):,} brand to generic mappings")
+    print(f"    built {len(generic_to_brand_map):,} generic to brand mappings")
+
+    return {
+        'product_to_ingredients': product_to_ingredients,
+        'form_lookup': form_lookup,
+        'dose_form_group_lookup': dose_form_group_lookup,
+        'brand_to_generic_map': brand_to_generic_map,
+        'generic_to_brand_map': generic_to_brand_map,
+    }
@@ -0,0 +1,223 @@
+"""
+Small stage DAG runner for the preprocessing pipeline
+independent stages run concurrently on a process pool. a stage starts once its dependencies
+are done and its memory estimate fits in the budget next to the stages already running,
+so a refresh takes about as long as the slowest load instead of the sum of all of them
+
+with a checkpoint_dir, every finished stage is pickled under a key built from its input files,
+arguments, code and upstream keys. a rerun restores matching checkpoints instead of recomputing,
+and stages only needed to feed a restored stage are skipped entirely
+"""
+
+import hashlib
+import inspect
+import multiprocessing
+import os
+import pickle
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+DEFAULT_MAX_WORKERS = min(4, os.cpu_count() or 1)
+
+
+class Stage:
+    """
+    one unit of pipeline work: func(*args, *dependency_results)
+    memory_estimate is the peak RSS (bytes) the stage is expected to need in its worker.
+    local stages are cheap glue that run in the parent once their dependencies finish
+    """
+
+    def __init__(self, name, func, args=(), deps=(), memory_estimate=0, local=False, inputs=()):
+        self.name = name
+        self.func = func
+        self.args = tuple(args)
+        self.deps = tuple(deps)
+        self.memory_estimate = memory_estimate
+        self.local = local
+        # files the stage reads, part of its checkpoint key
+        self.inputs = tuple(inputs)
+
+
+def file_memory_estimate(path, factor):
+    """rough peak memory for parsing a file: its size on disk times a per-format factor"""
+    try:
+        return int(os.path.getsize(path) * factor)
+    except OSError:
+        return 0
+
+
+def _file_fingerprint(path):
+    # size + mtime instead of a content hash, hashing the multi-GB RRF files would cost as much as parsing them
+    try:
+        stat = os.stat(path)
+        return f'{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}'
+    except OSError:
+        return f'{os.path.abspath(path)}:missing'
+
+
+def _local_sources(func):
+    """
+    source files behind a stage function: its own module plus every module it reaches through
+    imports that lives in the same directory, so editing a helper module invalidates the stage too
+    """
+    root = os.path.dirname(os.path.abspath(inspect.getsourcefile(func)))
+    sources = []
+    seen = set()
+    pending = [inspect.getmodule(func)]
+    while pending:
+        module = pending.pop()
+        path = getattr(module, '__file__', None)
+        if not path or module.__name__ in seen:
+            continue
+        seen.add(module.__name__)
+        path = os.path.abspath(path)
+        if os.path.dirname(path) != root or not path.endswith('.py'):
+            continue
+        sources.append(path)
+        for value in vars(module).values():
+            referenced = value if inspect.ismodule(value) else inspect.getmodule(value)
+            if referenced is not None and referenced.__name__ not in seen:
+                pending.append(referenced)
+    return sorted(sources)
+
+
+def stage_keys(stages):
+    """checkpoint key per stage: input files, arguments, source of the local modules it uses and upstream keys"""
+    by_name = {stage.name: stage for stage in stages}
+    keys = {}
+
+    def key_for(stage, visiting=()):
+        if stage.name in keys:
+            return keys[stage.name]
+        if stage.name in visiting:
+            raise ValueError(f"circular dependency through stage '{stage.name}'")
+        digest = hashlib.sha256()
+        digest.update(stage.name.encode())
+        digest.update(repr(stage.args).encode())
+        for path in stage.inputs:
+            digest.update(_file_fingerprint(path).encode())
+        for source in _local_sources(stage.func):
+            with open(source, 'rb') as f:
+                digest.update(f.read())
+        for dep in stage.deps:
+            digest.update(key_for(by_name[dep], visiting + (stage.name,)).encode())
+        keys[stage.name] = digest.hexdigest()[:16]
+        return keys[stage.name]
+
+    for stage in stages:
+        key_for(stage)
+    return keys
+
+
+def _checkpoint_path(checkpoint_dir, name, key):
+    return os.path.join(checkpoint_dir, f'{name}-{key}.pkl')
+
+
+def _save_checkpoint(checkpoint_dir, name, key, result):
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    # remove checkpoints from older versions of this stage
+    for filename in os.listdir(checkpoint_dir):
+        if filename.startswith(f'{name}-') and filename.endswith('.pkl'):
+            os.remove(os.path.join(checkpoint_dir, filename))
+    path = _checkpoint_path(checkpoint_dir, name, key)
+    # write then rename, so a crash mid-write never leaves a truncated checkpoint behind
+    with open(path + '.tmp', 'wb') as f:
+        pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(path + '.tmp', path)
+
+
+def _mp_context():
+    # fork keeps the parent's imports and does not re-run the calling script in each worker
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context()
+
+
+def run_stages(stages, max_workers=DEFAULT_MAX_WORKERS, memory_budget=None, checkpoint_dir=None, targets=None):
+    """
+    run every stage, respecting dependencies, worker count and memory budget
+    a stage bigger than the whole budget still runs, but only when nothing else is running.
+    targets limits the run to those stages and whatever they need (default: all stages).
+    returns {stage name: result}
+    """
+    names = [stage.name for stage in stages]
+    if len(set(names)) != len(names):
+        raise ValueError("stage names must be unique")
+    for stage in stages:
+        missing = [dep for dep in stage.deps if dep not in names]
+        if missing:
+            raise ValueError(f"stage '{stage.name}' depends on unknown stages: {missing}")
+
+    by_name = {stage.name: stage for stage in stages}
+    keys = stage_keys(stages) if checkpoint_dir else {}
+
+    def has_checkpoint(name):
+        return bool(checkpoint_dir) and os.path.exists(_checkpoint_path(checkpoint_dir, name, keys[name]))
+
+    # walk back from the targets, stopping at stages that can be restored
+    needed = set()
+    to_visit = list(targets) if targets is not None else list(names)
+    while to_visit:
+        name = to_visit.pop()
+        if name in needed:
+            continue
+        needed.add(name)
+        if not has_checkpoint(name):
+            to_visit.extend(by_name[name].deps)
+
+    results = {}
+    for name in names:
+        if name in needed and has_checkpoint(name):
+            with open(_checkpoint_path(checkpoint_dir, name, keys[name]), 'rb') as f:
+                results[name] = pickle.load(f)
+            print(f"    stage '{name}' restored from checkpoint")
+
+    def finish(stage, result, started):
+        results[stage.name] = result
+        if checkpoint_dir:
+            _save_checkpoint(checkpoint_dir, stage.name, keys[stage.name], result)
+        print(f"    stage '{stage.name}' finished in {time.perf_counter() - started:.1f}s")
+
+    pending = [stage for stage in stages if stage.name in needed and stage.name not in results]
+    running = {}
+    pipeline_started = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=_mp_context()) as pool:
+        while pending or running:
+            progressed = False
+
+            for stage in list(pending):
+                if not all(dep in results for dep in stage.deps):
+                    continue
+                dep_results = [results[dep] for dep in stage.deps]
+
+                if stage.local:
+                    pending.remove(stage)
+                    started = time.perf_counter()
+                    finish(stage, stage.func(*stage.args, *dep_results), started)
+                    progressed = True
+                    continue
+
+                if len(running) >= max_workers:
+                    continue
+                in_flight = sum(s.memory_estimate for s, _ in running.values())
+                if running and memory_budget is not None and in_flight + stage.memory_estimate > memory_budget:
+                    continue
+
+                future = pool.submit(stage.func, *stage.args, *dep_results)
+                running[future] = (stage, time.perf_counter())
+                pending.remove(stage)
+                progressed = True
+
+            if not running:
+                if pending and not progressed:
+                    raise ValueError(f"stages can never run (circular dependencies?): {[s.name for s in pending]}")
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, started = running.pop(future)
+                finish(stage, future.result(), started)
+
+    print(f"    all stages finished in {time.perf_counter() - pipeline_started:.1f}s")
+    return results
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Per-drug summary statistics with CPI-adjusted prices, computed for every RxCUI in one pass
+lets the site compare a drug against inflation with a lookup instead of loading its series
+
+cpi_u_annual.csv holds CPI-U annual averages (BLS series CUUR0000SA0).
+years outside the table are clamped to the nearest year it has, so extend it when a new year closes
+"""
+
+import argparse
+import json
+import os
+
+import pandas as pd
+
+from price_frame import DATA_DIR, PRICES_DIR, load_price_frame, prepare_price_frame
+
+CPI_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cpi_u_annual.csv')
+
+
+def load_cpi(path=CPI_FILE):
+    df_cpi = pd.read_csv(path, dtype={'year': int, 'cpi': float})
+    return df_cpi.set_index('year')['cpi'].sort_index()
+
+
+def cpi_for_years(years, cpi):
+    clamped = years.clip(lower=cpi.index.min(), upper=cpi.index.max())
+    return clamped.map(cpi)
+
+
+def compute_summary_stats(df, cpi):
+    """
+    one row per RxCUI: first and latest price (mean across NDCs on that date),
+    the first price carried forward by CPI to the latest year, and actual vs inflation deltas
+    """
+    df = prepare_price_frame(df)
+
+    per_date = (
+        df.groupby(['RXCUI', 'DateParsed'], sort=True)
+        .agg(Price=('Price', 'mean'), Date=('Date', 'first'))
+        .reset_index()
+    )
+    by_drug = per_date.groupby('RXCUI', sort=False)
+    summary = pd.DataFrame({
+        'first_date': by_drug['Date'].first(),
+        'first_price': by_drug['Price'].first(),
+        'first_year': by_drug['DateParsed'].first().dt.year,
+        'latest_date': by_drug['Date'].last(),
+        'latest_price': by_drug['Price'].last(),
+        'latest_year': by_drug['DateParsed'].last().dt.year,
+        'num_dates': by_drug.size(),
+    })
+    ndc_info = df.groupby('RXCUI', sort=False).agg(num_ndcs=('NDC', 'nunique'), is_brand=('IsBrand', 'first'))
+    summary = summary.join(ndc_info)
+
+    summary['dollar_change'] = summary['latest_price'] - summary['first_price']
+    summary['pct_change'] = summary['dollar_change'] / summary['first_price'] * 100
+
+    cpi_ratio = cpi_for_years(summary['latest_year'], cpi) / cpi_for_years(summary['first_year'], cpi)
+    summary['inflation_adjusted_price'] = summary['first_price'] * cpi_ratio
+    summary['inflation_pct_change'] = (cpi_ratio - 1) * 100
+    summary['diff_vs_inflation_dollars'] = summary['latest_price'] - summary['inflation_adjusted_price']
+    summary['diff_vs_inflation_pct'] = summary['diff_vs_inflation_dollars'] / summary['inflation_adjusted_price'] * 100
+
+    return summary
+
+
+def summary_to_json(summary):
+    summary = summary.copy()
+    for col in ['first_price', 'latest_price', 'dollar_change', 'inflation_adjusted_price', 'diff_vs_inflation_dollars']:
+        summary[col] = summary[col].round(5)
+    for col in ['pct_change', 'inflation_pct_change', 'diff_vs_inflation_pct']:
+        summary[col] = summary[col].round(2)
+    summary['is_brand'] = summary['is_brand'].astype(bool)
+    return json.loads(summary.to_json(orient='index'))
+
+
+def write_summary_stats(df, path, cpi=None):
+    if cpi is None:
+        cpi = load_cpi()
+    summary = compute_summary_stats(df, cpi)
+
+    past_table = summary['latest_year'] > cpi.index.max()
+    if past_table.any():
+        print(f"    WARNING: {past_table.sum():,} drugs have prices after {cpi.index.max()}, "
+              f"the last year in the CPI table; inflation is measured up to {cpi.index.max()} for them")
+
+    output = summary_to_json(summary)
+    with open(path, 'w') as f:
+        json.dump(output, f, indent=2)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compute per-drug summary stats with CPI-adjusted prices.')
+    parser.add_argument('--prices-dir', default=PRICES_DIR)
+    parser.add_argument('--cpi', default=CPI_FILE, help='CSV with year,cpi columns')
+    parser.add_argument('--out', default=os.path.join(DATA_DIR, 'summary_stats.json'))
+    args = parser.parse_args()
+
+    print("Loading price series...")
+    df = load_price_frame(args.prices_dir)
+    summary = write_summary_stats(df, args.out, load_cpi(args.cpi))
+    print(f"    summarized {len(summary):,} drugs")
+    print(f"saved summary stats to: {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,5 @@
 import type { DrugAllData, SinglePriceDataPoint } from './types';
-
-// Vite glob import - this gets all JSON files ready for dynamic loading
-const priceFiles = import.meta.glob('$lib/data/prices/*.json');
+import { loadRawDrugFiles } from './price-pack-loader';
 
 /**
  * Load drug price data for the given RxCUI codes
@@ -13,19 +11,24 @@ export async function loadDrugData(
 ): Promise<DrugAllData[]> {
 	const rxcuis = Object.keys(drugSearchTerms);
 
-	const loadPromises = rxcuis.map(async (rxcui): Promise<DrugAllData | null> => {
+	let rawFiles: Map<string, any>;
+	try {
+		// one fetch per pack instead of one per drug
+		rawFiles = await loadRawDrugFiles(rxcuis);
+	} catch (err) {
+		console.warn('Failed to load drug price data:', err);
+		return [];
+	}
+
+	const results = rxcuis.map((rxcui): DrugAllData | null => {
 		try {
-			const filePath = `/src/lib/data/prices/${rxcui}.json`;
-			const loader = priceFiles[filePath];
+			const data = rawFiles.get(rxcui);
 
-			if (!loader) {
+			if (!data) {
 				console.warn(`Price file not found for ${rxcui} (${drugSearchTerms[rxcui]})`);
 				return null;
 			}
 
-			const priceModule = (await loader()) as any;
-			const data = priceModule.default;
-
 			const pricesArray: SinglePriceDataPoint[] = [];
 
 			for (const [ndc, dates] of Object.entries(data.prices)) {
@@ -58,6 +61,5 @@ export async function loadDrugData(
 		}
 	});
 
-	const results = await Promise.all(loadPromises);
 	return results.filter((drug): drug is DrugAllData => drug !== null);
 }
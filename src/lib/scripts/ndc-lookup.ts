@@ -0,0 +1,91 @@
+import type { NdcEntry, NdcIndexMeta } from './types';
+
+// sharded NDC index written by automation/ndc_index.py: index.json plus one file per labeler prefix
+const indexFiles = import.meta.glob('$lib/data/ndc/index.json');
+const shardFiles = import.meta.glob('$lib/data/ndc/*.json');
+
+type NdcShard = { columns: string[]; rows: [string, string, string, string, boolean, number, string][] };
+
+let metaPromise: Promise<NdcIndexMeta | null> | null = null;
+const shardCache = new Map<string, Promise<NdcShard | null>>();
+
+function loadMeta(): Promise<NdcIndexMeta | null> {
+	if (!metaPromise) {
+		const loader = indexFiles['/src/lib/data/ndc/index.json'];
+		metaPromise = loader
+			? loader().then((module) => (module as any).default as NdcIndexMeta)
+			: Promise.resolve(null);
+	}
+	return metaPromise;
+}
+
+function loadShard(prefix: string): Promise<NdcShard | null> {
+	let shard = shardCache.get(prefix);
+	if (!shard) {
+		const loader = shardFiles[`/src/lib/data/ndc/${prefix}.json`];
+		shard = loader
+			? loader().then((module) => (module as any).default as NdcShard)
+			: Promise.resolve(null);
+		shardCache.set(prefix, shard);
+	}
+	return shard;
+}
+
+/**
+ * Normalize an NDC to its 11-digit (5-4-2) form
+ * hyphenated 10-digit codes (4-4-2, 5-3-2, 5-4-1) are padded in the short segment,
+ * bare digits are zero-filled on the left
+ * @param ndc - NDC as printed on a label or stored in the data
+ * @returns 11-digit NDC, or null if the input can't be one
+ */
+export function normalizeNdc(ndc: string): string | null {
+	const trimmed = ndc.trim();
+	const parts = trimmed.split('-');
+	if (parts.length === 3) {
+		if (!parts.every((part) => /^\d+$/.test(part))) return null;
+		const [labeler, product, pkg] = parts;
+		if (labeler.length > 5 || product.length > 4 || pkg.length > 2) return null;
+		return labeler.padStart(5, '0') + product.padStart(4, '0') + pkg.padStart(2, '0');
+	}
+	const digits = trimmed.replace(/\D/g, '');
+	if (!digits || digits.length > 11) return null;
+	return digits.padStart(11, '0');
+}
+
+/**
+ * Look up an NDC in the sharded index
+ * only the shard for the NDC's labeler prefix is fetched, then binary-searched
+ * @param ndc - NDC in any common format
+ * @returns RxCUI, labeler code and name, brand flag and latest price, or null if the NDC isn't indexed
+ */
+export async function lookupNdc(ndc: string): Promise<NdcEntry | null> {
+	const key = normalizeNdc(ndc);
+	if (!key) return null;
+	const meta = await loadMeta();
+	if (!meta) return null;
+
+	const prefix = key.slice(0, meta.prefix_len);
+	if (!(prefix in meta.shards)) return null;
+	const shard = await loadShard(prefix);
+	if (!shard) return null;
+
+	let lo = 0;
+	let hi = shard.rows.length;
+	while (lo < hi) {
+		const mid = (lo + hi) >> 1;
+		if (shard.rows[mid][0] < key) lo = mid + 1;
+		else hi = mid;
+	}
+	if (lo >= shard.rows.length || shard.rows[lo][0] !== key) return null;
+
+	const [entryNdc, rxcui, labelerCode, labeler, isBrand, latestPrice, latestDate] = shard.rows[lo];
+	return {
+		ndc: entryNdc,
+		rxcui,
+		labeler_code: labelerCode,
+		labeler,
+		is_brand: isBrand,
+		latest_price: latestPrice,
+		latest_date: latestDate
+	};
+}
@@ -0,0 +1,93 @@
+import type { PricePackManifest, RawDrugFile } from './types';
+import { decodeRawDrugFile } from './price-series';
+
+// packed bundles written by automation/price_packs.py - a few hundred files instead of one per drug
+// the per-drug files in data/prices are not globbed, so the build never processes them as modules
+const packFiles = import.meta.glob('$lib/data/packs/pack-*.json');
+const manifestFiles = import.meta.glob('$lib/data/packs/manifest.json');
+
+let manifestPromise: Promise<PricePackManifest | null> | null = null;
+const packCache = new Map<string, Promise<RawDrugFile[]>>();
+
+function loadManifest(): Promise<PricePackManifest | null> {
+	if (!manifestPromise) {
+		const loader = manifestFiles['/src/lib/data/packs/manifest.json'];
+		manifestPromise = loader
+			? loader().then((module) => (module as any).default as PricePackManifest)
+			: Promise.resolve(null);
+		manifestPromise.catch(() => (manifestPromise = null));
+	}
+	return manifestPromise;
+}
+
+function loadPack(id: string): Promise<RawDrugFile[]> {
+	let pack = packCache.get(id);
+	if (!pack) {
+		const loader = packFiles[`/src/lib/data/packs/${id}.json`];
+		pack = loader
+			? loader().then((module) => (module as any).default as RawDrugFile[])
+			: Promise.resolve([]);
+		// forget failed fetches so a later call can retry them
+		pack.catch(() => packCache.delete(id));
+		packCache.set(id, pack);
+	}
+	return pack;
+}
+
+/**
+ * Load the raw per-drug records for the given RxCUI codes
+ * drugs in the same pack share one fetch, and packs are cached for later calls
+ * change-point encoded records are expanded back to full per-date prices
+ * @param rxcuis - RxCUI codes to load
+ * @returns Promise of a map from RxCUI to its record (missing drugs, and drugs whose pack
+ * failed to load, are left out)
+ */
+export async function loadRawDrugFiles(rxcuis: string[]): Promise<Map<string, RawDrugFile>> {
+	const result = new Map<string, RawDrugFile>();
+	const manifest = await loadManifest();
+	if (!manifest) {
+		console.warn('No price packs found, run automation/price_packs.py');
+		return result;
+	}
+
+	const byPack = new Map<number, [string, number][]>();
+	for (const rxcui of rxcuis) {
+		const location = manifest.rxcuis[rxcui];
+		if (!location) continue;
+		const [packIndex, offset] = location;
+		if (!byPack.has(packIndex)) byPack.set(packIndex, []);
+		byPack.get(packIndex)!.push([rxcui, offset]);
+	}
+
+	await Promise.all(
+		Array.from(byPack.entries()).map(async ([packIndex, entries]) => {
+			const id = manifest.packs[packIndex].id;
+			let pack: RawDrugFile[];
+			try {
+				pack = await loadPack(id);
+			} catch (err) {
+				console.warn(`Failed to load price pack ${id}:`, err);
+				return;
+			}
+			for (const [rxcui, offset] of entries) {
+				try {
+					if (pack[offset]) result.set(rxcui, decodeRawDrugFile(pack[offset]));
+				} catch (err) {
+					console.warn(`Failed to read price data for ${rxcui}:`, err);
+				}
+			}
+		})
+	);
+
+	return result;
+}
+
+/**
+ * Load one drug's raw record from its pack
+ * @param rxcui - RxCUI code to load
+ * @returns Promise of the record, or null when the drug has no price data
+ */
+export async function loadRawDrugFile(rxcui: string): Promise<RawDrugFile | null> {
+	const files = await loadRawDrugFiles([rxcui]);
+	return files.get(rxcui) ?? null;
+}
@@ -0,0 +1,121 @@
+import type { DrugPricesOnly, RawDrugFile } from './types';
+
+// change-point encoded files (automation/price_encoding.py) keep only the dates a new price takes effect,
+// plus the drug's full date calendar (prices_dates) to expand them back onto
+export const CHANGE_POINTS = 'change_points';
+
+export interface ChangePointSeries {
+	keys: number[];
+	prices: number[];
+	// last observed date for the NDC, null when unknown
+	lastKey: number | null;
+}
+
+/**
+ * Turn a NADAC MM/DD/YYYY date into a sortable YYYYMMDD number
+ * @param date - date string as stored in the price files
+ * @returns numeric key, or NaN for malformed dates
+ */
+export function nadacDateKey(date: string): number {
+	const parts = date.split('/');
+	if (parts.length !== 3) return NaN;
+	return parseInt(parts[2]) * 10000 + parseInt(parts[0]) * 100 + parseInt(parts[1]);
+}
+
+/**
+ * Build a searchable series from one NDC's {date: price} points
+ * works on full and change-point series alike, repeated prices are collapsed
+ * @param dates - one NDC's price points
+ * @param last - last observed date (prices_last in encoded files)
+ */
+export function toChangePointSeries(
+	dates: { [date: string]: number },
+	last?: string
+): ChangePointSeries {
+	const points = Object.entries(dates)
+		.map(([date, price]) => [nadacDateKey(date), price] as [number, number])
+		.filter(([key]) => !isNaN(key))
+		.sort((a, b) => a[0] - b[0]);
+
+	const keys: number[] = [];
+	const prices: number[] = [];
+	for (const [key, price] of points) {
+		if (prices.length && prices[prices.length - 1] === price) continue;
+		keys.push(key);
+		prices.push(price);
+	}
+
+	let lastKey: number | null = points.length ? points[points.length - 1][0] : null;
+	if (last) lastKey = nadacDateKey(last);
+	return { keys, prices, lastKey };
+}
+
+/**
+ * Price in effect on a date, found by binary search over the change points
+ * @param series - series from toChangePointSeries
+ * @param date - MM/DD/YYYY date
+ * @returns price, or null before the first point or after the last observed date
+ */
+export function priceAt(series: ChangePointSeries, date: string): number | null {
+	const target = nadacDateKey(date);
+	if (isNaN(target) || (series.lastKey !== null && target > series.lastKey)) return null;
+
+	let lo = 0;
+	let hi = series.keys.length;
+	while (lo < hi) {
+		const mid = (lo + hi) >> 1;
+		if (series.keys[mid] <= target) lo = mid + 1;
+		else hi = mid;
+	}
+	return lo > 0 ? series.prices[lo - 1] : null;
+}
+
+/**
+ * Expand change points to a price on every date, clipped to each NDC's own range
+ * @param prices - change points per NDC
+ * @param last - last observed date per NDC
+ * @param dates - dates to expand onto, the drug's calendar (prices_dates); without it only the
+ * change dates and last dates come back, leaving out the flat stretches between changes
+ */
+export function decodeChangePoints(
+	prices: DrugPricesOnly,
+	last: { [ndc: string]: string },
+	dates?: string[]
+): DrugPricesOnly {
+	let calendar = dates;
+	if (!calendar) {
+		const all = new Set<string>(Object.values(last));
+		for (const changes of Object.values(prices)) {
+			for (const date of Object.keys(changes)) all.add(date);
+		}
+		calendar = Array.from(all);
+	}
+	calendar = [...calendar].sort((a, b) => nadacDateKey(a) - nadacDateKey(b));
+
+	const decoded: DrugPricesOnly = {};
+	for (const [ndc, changes] of Object.entries(prices)) {
+		const series = toChangePointSeries(changes, last[ndc]);
+		decoded[ndc] = {};
+		for (const date of calendar) {
+			const price = priceAt(series, date);
+			if (price !== null) decoded[ndc][date] = price;
+		}
+	}
+	return decoded;
+}
+
+/**
+ * Return a drug record with full per-date prices, whatever encoding it was written with
+ * @param file - raw per-drug record
+ */
+export function decodeRawDrugFile(file: RawDrugFile): RawDrugFile {
+	if (file.prices_encoding !== CHANGE_POINTS) return file;
+	const decoded: RawDrugFile = {
+		...file,
+		prices: decodeChangePoints(file.prices, file.prices_last ?? {}, file.prices_dates)
+	};
+	delete decoded.prices_encoding;
+	delete decoded.prices_dates;
+	delete decoded.prices_last;
+	return decoded;
+}
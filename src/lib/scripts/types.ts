@@ -50,3 +50,131 @@ export interface ChartPoint {
 	date: Date;
 	price: number;
 }
+
+// Precomputed price change events (price_events.json, written by automation/price_events.py)
+export interface PriceEvent {
+	ndc: string;
+	date: string;
+	prev_date: string;
+	from: number;
+	to: number;
+	dollar_change: number;
+	pct_change: number;
+}
+
+export interface PriceEventsFile {
+	thresholds: { pct: number; dollar_per_unit: number };
+	drugs: {
+		[rxcui: string]: {
+			largest_increase_pct?: PriceEvent;
+			largest_drop_pct?: PriceEvent;
+			largest_increase_dollar?: PriceEvent;
+			largest_drop_dollar?: PriceEvent;
+		};
+	};
+}
+
+// Step changes, at most max_per_drug per drug (price_event_steps.json)
+// rows are [rxcui, ndc, date, from, to, pct_change]
+export interface PriceEventStepsFile {
+	thresholds: { pct: number; dollar_per_unit: number };
+	max_per_drug: number | null;
+	columns: string[];
+	rows: [string, string, string, number, number, number][];
+}
+
+// Per-drug summary with CPI-adjusted prices (summary_stats.json, written by automation/summary_stats.py)
+// prices are per unit
+export interface DrugSummaryStats {
+	first_date: string;
+	first_price: number;
+	first_year: number;
+	latest_date: string;
+	latest_price: number;
+	latest_year: number;
+	num_dates: number;
+	num_ndcs: number;
+	is_brand: boolean;
+	dollar_change: number;
+	pct_change: number;
+	inflation_adjusted_price: number;
+	inflation_pct_change: number;
+	diff_vs_inflation_dollars: number;
+	diff_vs_inflation_pct: number;
+}
+
+// Raw per-drug record as written by automation/preprocess_pandas.py (prices are per unit)
+export interface RawDrugFile {
+	RxCUI: string;
+	Name: string;
+	IsBrand: boolean;
+	Brand_RxCUI: string;
+	Generic_RxCUI: string;
+	Ingredient_Name: string;
+	Manufacturer_Name: string;
+	Strength: string;
+	Form: string;
+	// written by automation/preprocess_pandas.py; absent from older price files
+	Ingredient_RxCUIs?: string[];
+	Form_Category?: string;
+	Dose_Form_Groups?: string[];
+	prices: DrugPricesOnly;
+	// set when written with PREPROCESS_PRICE_ENCODING=change_points (see price-series.ts)
+	prices_encoding?: 'change_points';
+	prices_dates?: string[];
+	prices_last?: { [ndc: string]: string };
+}
+
+// packs/manifest.json, written by automation/price_packs.py
+export interface PricePackManifest {
+	packs: { id: string; drugs: number; bytes: number }[];
+	// RxCUI -> [pack index, offset within that pack]
+	rxcuis: Record<string, [number, number]>;
+}
+
+// Top-N cross-drug rankings (rankings/<metric>.json, written by automation/rankings.py)
+export interface RankingEntry {
+	rxcui: string;
+	name: string;
+	formCategory: string;
+	value: number;
+	// brand_generic_gap only
+	generic_rxcui?: string;
+	brand_price?: number;
+	generic_price?: number;
+	gap_ratio?: number;
+}
+
+export interface RankingFile {
+	metric: string;
+	label: string;
+	overall: RankingEntry[];
+	byFormCategory: Record<string, RankingEntry[]>;
+	byYear: Record<string, RankingEntry[]>;
+}
+
+// rankings/index.json
+export interface RankingsIndex {
+	n: number;
+	metrics: Record<string, { label: string; formCategories: string[]; years: string[] }>;
+}
+
+// NDC lookup index (ndc/index.json + ndc/<prefix>.json, written by automation/ndc_index.py)
+export interface NdcIndexMeta {
+	prefix_len: number;
+	columns: string[];
+	// labeler prefix -> number of NDCs in that shard
+	shards: Record<string, number>;
+}
+
+export interface NdcEntry {
+	ndc: string;
+	rxcui: string;
+	// first five digits of the NDC
+	labeler_code: string;
+	// labeler name from RXNSAT (LABELER on the NDC's SPL atom), empty when unknown
+	labeler: string;
+	is_brand: boolean;
+	latest_price: number;
+	latest_date: string;
+}